@@ -1,7 +1,37 @@
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import threading
 import time
 
 import anthropic
+import httpx
+from response_cache import CachedResponse, SemanticResponseCache
+
+try:
+    import orjson
+except ImportError:  # Optional speedup, installed with chromadb
+    orjson = None
+
+
+class OrjsonHttpxClient(anthropic.DefaultHttpxClient):
+    """HTTP client that encodes JSON request bodies with orjson instead of stdlib json"""
+
+    def build_request(self, method, url, *, json: Any = None, **kwargs) -> httpx.Request:
+        if json is not None and kwargs.get("content") is None:
+            try:
+                kwargs["content"] = orjson.dumps(json)
+            except TypeError:
+                # Types orjson can't encode fall back to httpx's own encoder
+                return super().build_request(method, url, json=json, **kwargs)
+            headers = httpx.Headers(kwargs.get("headers"))
+            headers.setdefault("Content-Type", "application/json")
+            kwargs["headers"] = headers
+            return super().build_request(method, url, **kwargs)
+        return super().build_request(method, url, json=json, **kwargs)
+
 
 class AIGenerator:
     """Handles interactions with Anthropic's Claude API for generating responses"""
@@ -35,19 +65,74 @@ All responses must be:
 Provide complete answers that utilize all relevant search results.
 """
 
-    def __init__(self, api_key: str, model: str, base_url: str = "https://open.bigmodel.cn/api/anthropic"):
-        self.client = anthropic.Anthropic(api_key=api_key, base_url=base_url)
+    # Ephemeral cache breakpoint for the static system prompt, tools and message prefix
+    CACHE_CONTROL = {"type": "ephemeral"}
+
+    # Degraded answers from the tool loop that should not be served from cache
+    FALLBACK_PREFIXES = (
+        "I encountered an error",
+        "Reached maximum search rounds",
+        "I completed my searches but",
+    )
+
+    # Longest tool result sent back to Claude; extra search hits rarely help
+    MAX_TOOL_RESULT_CHARS = 4000
+    TRUNCATION_SUFFIX = "...[truncated]"
+
+    # Entries kept by the opt-in exact-match cache of final answers
+    LOCAL_CACHE_MAX = 128
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: str = "https://open.bigmodel.cn/api/anthropic",
+        response_cache: Optional[SemanticResponseCache] = None,
+        local_cache: bool = False,
+    ):
+        # Message payloads grow with every tool round, so encode them with orjson
+        if orjson is not None:
+            self.client = anthropic.Anthropic(
+                api_key=api_key, base_url=base_url, http_client=OrjsonHttpxClient()
+            )
+        else:
+            self.client = anthropic.Anthropic(api_key=api_key, base_url=base_url)
         self.model = model
+        self.response_cache = response_cache
+
+        # Exact-match answers by request payload, safe to reuse since temperature is 0.
+        # Requests run on threadpool workers, so reads and writes take the lock
+        self._local_cache: Optional[OrderedDict] = OrderedDict() if local_cache else None
+        self._local_cache_lock = threading.Lock()
 
         # Pre-build base API parameters
         self.base_params = {"model": self.model, "temperature": 0, "max_tokens": 800}
 
+        # Pre-build static request pieces shared by every call
+        self._system_base_blocks = [
+            {
+                "type": "text",
+                "text": self.SYSTEM_PROMPT,
+                "cache_control": self.CACHE_CONTROL,
+            }
+        ]
+        self._tool_choice_auto = {"type": "auto"}
+
+        # Cache-marked copy of the last tools list seen, reused while it is unchanged
+        self._tools_source: Optional[List] = None
+        self._cached_tools: Optional[List] = None
+
+        # Shared pool for running independent tool calls of one round concurrently
+        self._tool_pool = ThreadPoolExecutor(max_workers=4)
+
     def generate_response(
         self,
         query: str,
         conversation_history: Optional[str] = None,
         tools: Optional[List] = None,
         tool_manager=None,
+        no_cache: bool = False,
+        cache_key: Optional[str] = None,
     ) -> str:
         """
         Generate AI response with optional tool usage and conversation context.
@@ -57,18 +142,82 @@ Provide complete answers that utilize all relevant search results.
             conversation_history: Previous messages for context
             tools: Available tools the AI can use
             tool_manager: Manager to execute tools
+            no_cache: Bypass the semantic response cache (e.g. sensitive queries)
+            cache_key: The user's own question to key the semantic cache on, when
+                query wraps it in prompt text; defaults to query
 
         Returns:
             Generated response as string
         """
+        # Without streaming the whole answer arrives as a single chunk
+        (text,) = self._generate(
+            query, conversation_history, tools, tool_manager, no_cache, cache_key,
+            stream=False,
+        )
+        return text
+
+    def generate_response_stream(
+        self,
+        query: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List] = None,
+        tool_manager=None,
+        no_cache: bool = False,
+        cache_key: Optional[str] = None,
+    ) -> Iterator[str]:
+        """
+        Generate AI response as a stream of text deltas.
+
+        Rounds that may still call tools are requested without streaming since
+        the full tool_use blocks are needed; only the last round, sent without
+        tools, is streamed. An earlier round that answers arrives as one chunk.
 
-        # Build system content efficiently - avoid string ops when possible
-        system_content = (
-            f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-            if conversation_history
-            else self.SYSTEM_PROMPT
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+            no_cache: Bypass the semantic response cache (e.g. sensitive queries)
+            cache_key: The user's own question to key the semantic cache on, when
+                query wraps it in prompt text; defaults to query
+
+        Returns:
+            Iterator of response text chunks
+        """
+        return self._generate(
+            query, conversation_history, tools, tool_manager, no_cache, cache_key,
+            stream=True,
         )
 
+    def _generate(
+        self,
+        query: str,
+        conversation_history: Optional[str],
+        tools: Optional[List],
+        tool_manager,
+        no_cache: bool,
+        cache_key: Optional[str],
+        stream: bool,
+    ) -> Iterator[str]:
+        """Shared response pipeline behind generate_response and its streaming variant"""
+        use_cache = self.response_cache is not None and not no_cache
+        # A shared prompt prefix would pull every embedding together, so near
+        # duplicates are judged on the question alone
+        if cache_key is None:
+            cache_key = query
+
+        # Serve near-duplicate questions without an API round-trip
+        if use_cache:
+            cached = self.response_cache.lookup(cache_key, conversation_history)
+            if cached is not None:
+                if tool_manager:
+                    tool_manager.restore_sources(cached.sources)
+                yield cached.text
+                return
+
+        # Build system content as blocks so the static prompt prefix is cached
+        system_content = self._build_system_blocks(conversation_history)
+
         # Prepare API call parameters efficiently
         api_params = {
             **self.base_params,
@@ -78,22 +227,155 @@ Provide complete answers that utilize all relevant search results.
 
         # Add tools if available
         if tools:
-            api_params["tools"] = tools
-            api_params["tool_choice"] = {"type": "auto"}
+            api_params["tools"] = self._with_tools_cache_breakpoint(tools)
+            api_params["tool_choice"] = self._tool_choice_auto
+
+        # Identical (system, messages, tools) payloads get the same answer back
+        local_key = None
+        if self._local_cache is not None and not no_cache:
+            local_key = self._local_cache_key(api_params)
+            with self._local_cache_lock:
+                hit = self._local_cache.get(local_key)
+                if hit is not None:
+                    self._local_cache.move_to_end(local_key)
+            if hit is not None:
+                if tool_manager:
+                    tool_manager.restore_sources(hit.sources)
+                yield hit.text
+                return
+
+        chunks = []
+        if stream and not tools:
+            # No tool calls possible, so the first response is the final answer
+            for text in self._final_text(api_params, stream=True):
+                chunks.append(text)
+                yield text
+        else:
+            # Get response from Claude
+            response = self.client.messages.create(**api_params)
+
+            # Handle tool execution if needed, otherwise use the direct response
+            if response.stop_reason == "tool_use" and tool_manager:
+                for text in self._handle_tool_execution(
+                    response, api_params, tool_manager, stream=stream
+                ):
+                    chunks.append(text)
+                    yield text
+            else:
+                chunks.append(response.content[0].text)
+                yield chunks[-1]
+
+        if use_cache or local_key is not None:
+            text = "".join(chunks)
+            if not text.startswith(self.FALLBACK_PREFIXES):
+                sources = tool_manager.get_last_sources() if tool_manager else []
+                if use_cache:
+                    self.response_cache.store(cache_key, conversation_history, text, sources)
+                if local_key is not None:
+                    with self._local_cache_lock:
+                        self._local_cache[local_key] = CachedResponse(text, list(sources))
+                        if len(self._local_cache) > self.LOCAL_CACHE_MAX:
+                            self._local_cache.popitem(last=False)
+
+    def clear_local_cache(self):
+        """Drop exact-match answers, e.g. after the course catalog changes"""
+        if self._local_cache is not None:
+            with self._local_cache_lock:
+                self._local_cache.clear()
+
+    @staticmethod
+    def _local_cache_key(api_params: Dict[str, Any]) -> str:
+        """Hash the parts of a request that determine its answer"""
+        payload = json.dumps(
+            [api_params["system"], api_params["messages"], api_params.get("tools")],
+            sort_keys=True,
+            default=dict,
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _final_text(self, params: Dict[str, Any], stream: bool) -> Iterator[str]:
+        """Request a final answer, streaming text deltas or yielding the full text"""
+        if stream:
+            with self.client.messages.stream(**params) as response_stream:
+                yield from response_stream.text_stream
+        else:
+            yield self.client.messages.create(**params).content[0].text
+
+    def _build_system_blocks(
+        self, conversation_history: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Build structured system content with a cache breakpoint on the static prompt.
+
+        The conversation history changes between requests, so it goes in a
+        separate trailing block without cache_control.
+
+        Args:
+            conversation_history: Previous messages for context
 
-        # Get response from Claude
-        response = self.client.messages.create(**api_params)
+        Returns:
+            List of system text blocks
+        """
+        if not conversation_history:
+            return self._system_base_blocks
+        return [
+            *self._system_base_blocks,
+            {
+                "type": "text",
+                "text": f"Previous conversation:\n{conversation_history}",
+            },
+        ]
+
+    def _with_tools_cache_breakpoint(self, tools: List) -> List:
+        """Return a copy of tools with cache_control on the last definition"""
+        if tools is not self._tools_source:
+            self._tools_source = tools
+            self._cached_tools = [
+                *tools[:-1],
+                {**tools[-1], "cache_control": self.CACHE_CONTROL},
+            ]
+        return self._cached_tools
+
+    def _move_messages_cache_breakpoints(
+        self, messages: List[Dict[str, Any]], tool_results: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Keep the rolling message cache breakpoints on the last two user turns.
 
-        # Handle tool execution if needed
-        if response.stop_reason == "tool_use" and tool_manager:
-            return self._handle_tool_execution(response, api_params, tool_manager)
+        The newest tool results are the new cache write, and the previous user
+        turn repeats the breakpoint sent with the last request so that prefix is
+        read back exactly. Older user turns lose their markers so the request
+        stays within Anthropic's limit of 4 (system, tools, two messages).
 
-        # Return direct response
-        return response.content[0].text
+        Args:
+            messages: Message history, before the new tool results are appended
+            tool_results: Tool result blocks about to be sent as the next user turn
+        """
+        previous_user = None
+        for index, msg in enumerate(messages):
+            if msg.get("role") != "user":
+                continue
+            previous_user = index
+            if isinstance(msg.get("content"), list):
+                for block in msg["content"]:
+                    if isinstance(block, dict):
+                        block.pop("cache_control", None)
+
+        if previous_user is not None:
+            msg = messages[previous_user]
+            content = msg["content"]
+            if isinstance(content, str):
+                # Plain string turns can't carry cache_control, wrap in a text block
+                content = [{"type": "text", "text": content}]
+                messages[previous_user] = {**msg, "content": content}
+            if content and isinstance(content[-1], dict):
+                content[-1]["cache_control"] = self.CACHE_CONTROL
+
+        tool_results[-1]["cache_control"] = self.CACHE_CONTROL
 
     def _handle_tool_execution(
-        self, initial_response, base_params: Dict[str, Any], tool_manager
-    ):
+        self, initial_response, base_params: Dict[str, Any], tool_manager, stream: bool = False
+    ) -> Iterator[str]:
         """
         Handle sequential execution of tool calls and get follow-up response.
 
@@ -101,15 +383,16 @@ Provide complete answers that utilize all relevant search results.
             initial_response: The response containing tool use requests
             base_params: Base API parameters
             tool_manager: Manager to execute tools
+            stream: Stream the final answer instead of waiting for completion
 
         Returns:
-            Final response text after tool execution
+            Iterator of final response text after tool execution
         """
         return self._handle_sequential_tool_execution(
-            initial_response, base_params, tool_manager, max_rounds=2
+            initial_response, base_params, tool_manager, max_rounds=2, stream=stream
         )
 
-    def _handle_sequential_tool_execution(self, initial_response, base_params: Dict[str, Any], tool_manager, max_rounds: int = 2):
+    def _handle_sequential_tool_execution(self, initial_response, base_params: Dict[str, Any], tool_manager, max_rounds: int = 2, stream: bool = False) -> Iterator[str]:
         """
         Handle sequential tool execution with configurable maximum rounds.
 
@@ -118,9 +401,10 @@ Provide complete answers that utilize all relevant search results.
             base_params: Base API parameters
             tool_manager: Manager to execute tools
             max_rounds: Maximum number of tool execution rounds
+            stream: Stream the final answer instead of waiting for completion
 
         Returns:
-            Final response text after sequential tool execution
+            Iterator of final response text after sequential tool execution
         """
         # Start with existing messages
         messages = base_params["messages"].copy()
@@ -128,136 +412,223 @@ Provide complete answers that utilize all relevant search results.
         # Add AI's initial tool use response
         messages.append({"role": "assistant", "content": initial_response.content})
 
+        # Running length of the conversation, updated as messages are appended
+        max_chars = 15000
+        total_chars = sum(self._content_len(msg.get("content", "")) for msg in messages)
+
+        # Untruncated successful tool results, in order, for fallback summaries
+        successful_results: List[str] = []
+
         current_response = initial_response
         round_count = 0
 
+        # Single follow-up request dict, with the tools fields toggled per call
+        followup_params = {
+            **self.base_params,
+            "messages": messages,
+            "system": base_params["system"],
+        }
+
         # Execute tools sequentially, allowing Claude to refine searches
         while current_response.stop_reason == "tool_use" and round_count < max_rounds:
-            # Safety check: don't exceed conversation length limits
-            if self._check_conversation_length_safety(messages):
-                break
+            # Safety check: shrink old search results instead of exceeding length limits
+            if total_chars > max_chars:
+                total_chars = self._compact_messages(messages, total_chars, max_chars)
 
             # Execute all tool calls in current response
+            tool_uses = [block for block in current_response.content if block.type == "tool_use"]
+            if len(tool_uses) > 1:
+                # Independent searches are I/O-bound on the vector store, run them together
+                outcomes = list(self._tool_pool.map(
+                    lambda block: self._run_tool(tool_manager, block), tool_uses
+                ))
+            else:
+                outcomes = [self._run_tool(tool_manager, block) for block in tool_uses]
+
             tool_results = []
-            execution_success = True
-
-            for content_block in current_response.content:
-                if content_block.type == "tool_use":
-                    try:
-                        tool_result = tool_manager.execute_tool(
-                            content_block.name,
-                            **content_block.input
-                        )
-
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": tool_result
-                        })
-                    except Exception as e:
-                        # Handle individual tool execution errors gracefully
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": f"Error executing tool: {str(e)}"
-                        })
-                        execution_success = False
-
-            # Add tool results as single message
+            for block, (content, ok) in zip(tool_uses, outcomes):
+                if ok and not content.startswith("Error"):
+                    successful_results.append(content)
+                tool_results.append({
+                    "type": "tool_result",
+                    "tool_use_id": block.id,
+                    "content": self._truncate_tool_result(content)
+                })
+            execution_success = all(ok for _, ok in outcomes)
+
+            # Add tool results as single message, caching the prefix up to them
             if tool_results:
+                self._move_messages_cache_breakpoints(messages, tool_results)
                 messages.append({"role": "user", "content": tool_results})
+                total_chars += self._content_len(tool_results)
 
             # If tool execution failed and we have results from previous rounds,
             # try to answer with what we have
             if not execution_success and round_count > 0:
                 break
 
-            # Get next response from Claude (without tools this time to avoid infinite loops)
-            followup_params = {
-                **self.base_params,
-                "messages": messages,
-                "system": base_params["system"],
-                "tools": None  # Remove tools to force Claude to respond with final answer
-            }
+            # Keep tools available until the final permitted round, which must answer
+            is_last_round = round_count + 1 >= max_rounds
+            if is_last_round:
+                followup_params["tools"] = None
+                followup_params.pop("tool_choice", None)
+            else:
+                followup_params["tools"] = base_params.get("tools", [])
+                followup_params["tool_choice"] = self._tool_choice_auto
 
             try:
+                if stream and is_last_round:
+                    # Tools are withheld, so this round must be the final answer.
+                    # Earlier rounds aren't streamed: their text may only narrate
+                    # a tool call, which isn't known until the round completes
+                    yield from self._final_text(followup_params, stream=True)
+                    round_count += 1
+                    return
+
                 next_response = self.client.messages.create(**followup_params)
                 round_count += 1
 
                 # Check if Claude wants to make another tool call
-                if next_response.stop_reason == "tool_use" and round_count < max_rounds:
-                    # Continue with another round of tool execution
-                    # Re-add tools for this round only
-                    followup_params["tools"] = base_params.get("tools", [])
-                    followup_params["tool_choice"] = {"type": "auto"}
-                    next_response = self.client.messages.create(**followup_params)
-
-                    if next_response.stop_reason == "tool_use":
-                        # Add Claude's new tool use request and continue the loop
-                        messages.append({"role": "assistant", "content": next_response.content})
-                        current_response = next_response
-                        continue
+                if next_response.stop_reason == "tool_use" and not is_last_round:
+                    # Add Claude's new tool use request and continue the loop
+                    messages.append({"role": "assistant", "content": next_response.content})
+                    total_chars += self._content_len(next_response.content)
+                    current_response = next_response
+                    continue
 
                 # Claude provided final response (no more tool calls)
-                return next_response.content[0].text
+                yield next_response.content[0].text
+                return
 
             except Exception as e:
                 # Handle API errors gracefully
                 if round_count == 0:
                     # No successful tool executions, return error message
-                    return f"I encountered an error while searching: {str(e)}. Please try rephrasing your question."
+                    yield f"I encountered an error while searching: {str(e)}. Please try rephrasing your question."
                 else:
                     # We have some results, try to provide partial answer
-                    return f"I encountered an error during my search, but here's what I found: {self._summarize_available_results(messages)}"
+                    yield f"I encountered an error during my search, but here's what I found: {self._summarize_available_results(successful_results)}"
+                return
 
         # If we exit the loop without a final response, create one
         if round_count >= max_rounds:
             # Hit max rounds, force Claude to respond with what we have
-            final_params = {
-                **self.base_params,
-                "messages": messages,
-                "system": base_params["system"]
-            }
+            followup_params.pop("tools", None)
+            followup_params.pop("tool_choice", None)
             try:
-                final_response = self.client.messages.create(**final_params)
-                return final_response.content[0].text
+                yield from self._final_text(followup_params, stream)
             except Exception as e:
-                return f"Reached maximum search rounds. Based on my searches: {self._summarize_available_results(messages)}"
+                yield f"Reached maximum search rounds. Based on my searches: {self._summarize_available_results(successful_results)}"
+            return
 
         # Default fallback
-        return "I completed my searches but was unable to generate a final response."
+        yield "I completed my searches but was unable to generate a final response."
 
-    def _check_conversation_length_safety(self, messages: List[Dict[str, Any]], max_chars: int = 15000) -> bool:
+    def _run_tool(self, tool_manager, content_block) -> Tuple[str, bool]:
+        """
+        Execute a single tool_use block.
+
+        Returns:
+            Tuple of (tool result content, whether execution succeeded)
         """
-        Check if conversation is getting too long to avoid token limits.
+        try:
+            return tool_manager.execute_tool(content_block.name, **content_block.input), True
+        except Exception as e:
+            # Handle individual tool execution errors gracefully
+            return f"Error executing tool: {str(e)}", False
+
+    def _truncate_tool_result(self, content: str) -> str:
+        """Cap a tool result's length before it is added to the conversation"""
+        if len(content) <= self.MAX_TOOL_RESULT_CHARS:
+            return content
+        keep = self.MAX_TOOL_RESULT_CHARS - len(self.TRUNCATION_SUFFIX)
+        return content[:keep] + self.TRUNCATION_SUFFIX
+
+    @staticmethod
+    def _content_len(content: Any) -> int:
+        """
+        Approximate the length of message content without serializing it.
+
+        Sums the string fields of each content block (text, tool input values,
+        tool_result content) instead of building str() of the whole list.
 
         Args:
-            messages: Current message history
-            max_chars: Maximum character limit before truncation
+            content: Message content, either a string or a list of blocks
 
         Returns:
-            True if conversation is too long, False otherwise
+            Number of characters in the content's string fields
         """
-        total_chars = sum(len(str(msg.get("content", ""))) for msg in messages)
-        return total_chars > max_chars
-
-    def _summarize_available_results(self, messages: List[Dict[str, Any]]) -> str:
+        if isinstance(content, str):
+            return len(content)
+
+        total = 0
+        for block in content or []:
+            if isinstance(block, dict):
+                values = block.values()
+            else:
+                values = [getattr(block, "text", None)]
+                block_input = getattr(block, "input", None)
+                if isinstance(block_input, dict):
+                    values += list(block_input.values())
+            total += sum(len(value) for value in values if isinstance(value, str))
+        return total
+
+    def _compact_messages(
+        self, messages: List[Dict[str, Any]], total_chars: int, max_chars: int = 15000
+    ) -> int:
         """
-        Extract and summarize search results from message history.
+        Shrink the conversation in place once it grows past the length limit.
+
+        Oldest tool results are elided first, keeping their tool_use_id since the
+        API requires every tool_use to be answered, until the conversation is
+        back under max_chars - 4000. Text blocks from earlier assistant turns,
+        which only narrate superseded searches, are dropped as well.
 
         Args:
             messages: Current message history
+            total_chars: Running length of the conversation
+            max_chars: Maximum character limit before compaction
 
         Returns:
-            Summary of available search results
+            Length of the conversation after compaction
         """
-        results = []
+        if total_chars <= max_chars:
+            return total_chars
+
+        target_chars = max_chars - 4000
         for msg in messages:
-            if msg.get("role") == "user" and isinstance(msg.get("content"), list):
-                for content in msg["content"]:
-                    if content.get("type") == "tool_result" and not content.get("content", "").startswith("Error"):
-                        results.append(content["content"])
+            if total_chars <= target_chars:
+                break
+            if msg.get("role") != "user" or not isinstance(msg.get("content"), list):
+                continue
+            for block in msg["content"]:
+                content = block.get("content", "")
+                if block.get("type") != "tool_result" or content.startswith("[elided: "):
+                    continue
+                block["content"] = f"[elided: {content[:120]}...]"
+                total_chars -= len(content) - len(block["content"])
+                if total_chars <= target_chars:
+                    break
+
+        # Culling narration before superseded tool calls; the latest turn stays intact
+        assistant_msgs = [msg for msg in messages if msg.get("role") == "assistant"]
+        for msg in assistant_msgs[:-1]:
+            kept = [block for block in msg["content"] if getattr(block, "type", None) != "text"]
+            total_chars -= self._content_len(msg["content"]) - self._content_len(kept)
+            msg["content"] = kept
+
+        return total_chars
+
+    def _summarize_available_results(self, results: List[str]) -> str:
+        """
+        Summarize the search results gathered so far.
 
+        Args:
+            results: Untruncated successful tool results, in execution order
+
+        Returns:
+            Summary of available search results
+        """
         if results:
             return " ".join(results[:3])  # Return first 3 results to avoid length issues
         return "No search results were successfully retrieved."
@@ -2,17 +2,28 @@ import warnings
 
 warnings.filterwarnings("ignore", message="resource_tracker: There appear to be.*")
 
+import json
 import os
 from typing import List, Optional
 
 from config import config
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from rag_system import RAGSystem
 
+try:
+    import orjson
+except ImportError:  # Optional speedup, installed with chromadb
+    orjson = None
+
+# JSON endpoints return plain dicts encoded directly, skipping jsonable_encoder
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
 # Initialize FastAPI app
 app = FastAPI(title="Course Materials RAG System", root_path="")
 
@@ -59,7 +70,9 @@ class CourseStats(BaseModel):
 # API Endpoints
 
 
-@app.post("/api/query", response_model=QueryResponse)
+@app.post(
+    "/api/query", response_model=QueryResponse, response_class=FastJSONResponse
+)
 async def query_documents(request: QueryRequest):
     """Process a query and return response with sources"""
     try:
@@ -68,22 +81,52 @@ async def query_documents(request: QueryRequest):
         if not session_id:
             session_id = rag_system.session_manager.create_session()
 
-        # Process query using RAG system
-        answer, sources = rag_system.query(request.query, session_id)
+        # Process query in a worker thread so the blocking Claude calls
+        # don't stall the event loop for other requests
+        answer, sources = await run_in_threadpool(
+            rag_system.query, request.query, session_id
+        )
 
-        return QueryResponse(answer=answer, sources=sources, session_id=session_id)
+        return FastJSONResponse(
+            {"answer": answer, "sources": sources, "session_id": session_id}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/courses", response_model=CourseStats)
+@app.post("/api/query/stream")
+async def query_documents_stream(request: QueryRequest):
+    """Process a query and stream the answer as newline-delimited JSON events"""
+    session_id = request.session_id
+    if not session_id:
+        session_id = rag_system.session_manager.create_session()
+
+    def event_stream():
+        try:
+            for event in rag_system.query_stream(request.query, session_id):
+                if event["type"] == "done":
+                    event["session_id"] = session_id
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    # Sync generator is iterated in a worker thread, keeping the event loop free
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
+@app.get(
+    "/api/courses", response_model=CourseStats, response_class=FastJSONResponse
+)
 async def get_course_stats():
     """Get course analytics and statistics"""
     try:
-        analytics = rag_system.get_course_analytics()
-        return CourseStats(
-            total_courses=analytics["total_courses"],
-            course_titles=analytics["course_titles"],
+        analytics = await run_in_threadpool(rag_system.get_course_analytics)
+        return FastJSONResponse(
+            {
+                "total_courses": analytics["total_courses"],
+                "course_titles": analytics["course_titles"],
+            }
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,5 +1,6 @@
 import os
 from dataclasses import dataclass
+from typing import Optional
 
 from dotenv import load_dotenv
 
@@ -25,6 +26,15 @@ class Config:
     MAX_RESULTS: int = 5  # Maximum search results to return
     MAX_HISTORY: int = 2  # Number of conversation messages to remember
 
+    # Semantic response cache settings
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_THRESHOLD: float = 0.92  # Minimum cosine similarity for a hit
+    RESPONSE_CACHE_TTL: int = 3600  # Seconds before a cached answer expires
+
+    # Semantic search cache settings
+    SEARCH_CACHE_THRESHOLD: Optional[float] = 0.95  # Min cosine similarity, None = off
+    SEARCH_CACHE_SIZE: int = 500  # Searches kept, least recently used evicted first
+
     # Database paths
     CHROMA_PATH: str = "./chroma_db"  # ChromaDB storage location
 
@@ -2,16 +2,9 @@
 """Debug script to identify why documents aren't being loaded"""
 
 import os
-import sys
-from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
-# Add current directory to path
-current_dir = Path(__file__).parent
-sys.path.insert(0, str(current_dir))
-
-from document_processor import DocumentProcessor
-from vector_store import VectorStore
-from config import config
+COURSE_FILE_EXTENSIONS = {'.txt', '.pdf', '.docx'}
 
 def debug_document_loading():
     """Debug the document loading process step by step"""
@@ -24,15 +17,22 @@ def debug_document_loading():
     print(f"   Exists: {os.path.exists(docs_path)}")
 
     if os.path.exists(docs_path):
-        files = os.listdir(docs_path)
-        print(f"   Files found: {files}")
-
-        course_files = [f for f in files if f.lower().endswith(('.txt', '.pdf', '.docx'))]
+        with os.scandir(docs_path) as entries:
+            course_files = [
+                entry.name for entry in entries
+                if entry.is_file(follow_symlinks=False)
+                and os.path.splitext(entry.name)[1].lower() in COURSE_FILE_EXTENSIONS
+            ]
         print(f"   Course files: {course_files}")
     else:
         print("   ERROR: docs directory doesn't exist!")
         return
 
+    # Deferred so the missing-directory path doesn't pay for chromadb/torch imports
+    from document_processor import DocumentProcessor
+    from vector_store import VectorStore
+    from config import config
+
     # 2. Check ChromaDB path
     print(f"\n2. Checking ChromaDB path: {config.CHROMA_PATH}")
     print(f"   Exists: {os.path.exists(config.CHROMA_PATH)}")
@@ -42,21 +42,31 @@ def debug_document_loading():
         print(f"\n3. Testing document processor...")
         processor = DocumentProcessor(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
 
-        for course_file in course_files[:2]:  # Test first 2 files
-            file_path = os.path.join(docs_path, course_file)
-            print(f"   Processing: {course_file}")
+        # Parse the first 2 files in parallel; parsing is CPU-bound
+        test_files = course_files[:2]
+        parsed = {}
+        with ProcessPoolExecutor(max_workers=max(1, min(4, len(test_files)))) as executor:
+            futures = {
+                course_file: executor.submit(
+                    processor.process_course_document, os.path.join(docs_path, course_file)
+                )
+                for course_file in test_files
+            }
 
-            try:
-                course, chunks = processor.process_course_document(file_path)
-                print(f"     Course title: {course.title if course else 'None'}")
-                print(f"     Number of lessons: {len(course.lessons) if course else 0}")
-                print(f"     Number of chunks: {len(chunks)}")
+            for course_file, future in futures.items():
+                print(f"   Processing: {course_file}")
 
-                if chunks:
-                    print(f"     First chunk preview: {chunks[0].content[:100]}...")
+                try:
+                    course, chunks = parsed[course_file] = future.result()
+                    print(f"     Course title: {course.title if course else 'None'}")
+                    print(f"     Number of lessons: {len(course.lessons) if course else 0}")
+                    print(f"     Number of chunks: {len(chunks)}")
 
-            except Exception as e:
-                print(f"     ERROR processing {course_file}: {e}")
+                    if chunks:
+                        print(f"     First chunk preview: {chunks[0].content[:100]}...")
+
+                except Exception as e:
+                    print(f"     ERROR processing {course_file}: {e}")
 
         # 4. Test vector store
         print(f"\n4. Testing vector store...")
@@ -64,16 +74,13 @@ def debug_document_loading():
             vector_store = VectorStore(config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS)
 
             # Check existing courses
-            existing_titles = vector_store.get_existing_course_titles()
+            existing_titles, course_count = vector_store.get_analytics()
             print(f"   Existing course titles in vector store: {existing_titles}")
-
-            course_count = vector_store.get_course_count()
             print(f"   Course count in vector store: {course_count}")
 
-            # Test adding a course
-            if course_files:
-                test_file = os.path.join(docs_path, course_files[0])
-                course, chunks = processor.process_course_document(test_file)
+            # Test adding a course, reusing the parse from step 3
+            if course_files and course_files[0] in parsed:
+                course, chunks = parsed[course_files[0]]
 
                 if course and chunks:
                     print(f"   Attempting to add course: {course.title}")
@@ -89,7 +96,7 @@ def debug_document_loading():
                         print(f"   Course added successfully")
 
                         # Verify it was added
-                        new_count = vector_store.get_course_count()
+                        _, new_count = vector_store.get_analytics()
                         print(f"   New course count: {new_count}")
 
         except Exception as e:
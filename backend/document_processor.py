@@ -1,9 +1,27 @@
+import hashlib
 import os
 import re
-from typing import List, Tuple
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import List, Optional, Tuple
 
 from models import Course, CourseChunk, Lesson
 
+# Course document patterns, compiled once at import rather than per line
+_TITLE_RE = re.compile(r"^Course Title:\s*(.+)$", re.IGNORECASE)
+_COURSE_LINK_RE = re.compile(r"^Course Link:\s*(.+)$", re.IGNORECASE)
+_INSTRUCTOR_RE = re.compile(r"^Course Instructor:\s*(.+)$", re.IGNORECASE)
+_LESSON_RE = re.compile(r"^Lesson\s+(\d+):\s*(.+)$", re.IGNORECASE)
+_LESSON_LINK_RE = re.compile(r"^Lesson Link:\s*(.+)$", re.IGNORECASE)
+
+# Better sentence splitting that handles abbreviations
+# This regex looks for periods followed by whitespace and capital letters
+# but ignores common abbreviations. The cheap end-of-sentence lookbehind
+# comes first so most positions are rejected before the abbreviation checks
+_SENTENCE_END_RE = re.compile(
+    r"(?<=[.!?])(?<!\w\.\w.)(?<![A-Z][a-z]\.)\s+(?=[A-Z])"
+)
+
 
 class DocumentProcessor:
     """Processes course documents and extracts structured information"""
@@ -12,6 +30,38 @@ class DocumentProcessor:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
 
+    def compute_file_hash(self, file_path: str) -> str:
+        """Return the SHA-256 hex digest of a file's raw bytes"""
+        with open(file_path, "rb") as file:
+            return hashlib.file_digest(file, "sha256").hexdigest()
+
+    def peek_course_title(self, file_path: str) -> Optional[str]:
+        """
+        Read the course title from the start of a file without parsing the rest.
+
+        Mirrors the title rules of process_course_document.
+
+        Returns:
+            The course title, or None if it cannot be determined from the first 4KB
+        """
+        with open(file_path, "rb") as file:
+            head = file.read(4096)
+            truncated = bool(file.read(1))
+
+        text = head.decode("utf-8", errors="ignore").strip()
+        if not text:
+            return None if truncated else os.path.basename(file_path)
+
+        first_line, newline, _ = text.partition("\n")
+        if not newline and truncated:
+            return None
+
+        first_line = first_line.strip()
+        title_match = _TITLE_RE.match(first_line)
+        if title_match:
+            return title_match.group(1).strip()
+        return first_line
+
     def read_file(self, file_path: str) -> str:
         """Read content from file with UTF-8 encoding"""
         try:
@@ -26,71 +76,37 @@ class DocumentProcessor:
         """Split text into sentence-based chunks with overlap using config settings"""
 
         # Clean up the text
-        text = re.sub(r"\s+", " ", text.strip())  # Normalize whitespace
+        text = " ".join(text.split())  # Normalize whitespace
 
-        # Better sentence splitting that handles abbreviations
-        # This regex looks for periods followed by whitespace and capital letters
-        # but ignores common abbreviations
-        sentence_endings = re.compile(
-            r"(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\!|\?)\s+(?=[A-Z])"
-        )
-        sentences = sentence_endings.split(text)
+        sentences = _SENTENCE_END_RE.split(text)
 
         # Clean sentences
         sentences = [s.strip() for s in sentences if s.strip()]
 
+        # ends[k] is the joined length of sentences[:k] plus one separator per
+        # sentence, so sentences[i:j] joined with spaces is ends[j] - ends[i] - 1
+        # characters and chunk boundaries can be found by binary search
+        ends = [0, *accumulate(len(sentence) + 1 for sentence in sentences)]
+
         chunks = []
         i = 0
 
         while i < len(sentences):
-            current_chunk = []
-            current_size = 0
-
-            # Build chunk starting from sentence i
-            for j in range(i, len(sentences)):
-                sentence = sentences[j]
-
-                # Calculate size with space
-                space_size = 1 if current_chunk else 0
-                total_addition = len(sentence) + space_size
-
-                # Check if adding this sentence would exceed chunk size
-                if current_size + total_addition > self.chunk_size and current_chunk:
-                    break
-
-                current_chunk.append(sentence)
-                current_size += total_addition
-
-            # Add chunk if we have content
-            if current_chunk:
-                chunks.append(" ".join(current_chunk))
-
-                # Calculate overlap for next chunk
-                if hasattr(self, "chunk_overlap") and self.chunk_overlap > 0:
-                    # Find how many sentences to overlap
-                    overlap_size = 0
-                    overlap_sentences = 0
-
-                    # Count backwards from end of current chunk
-                    for k in range(len(current_chunk) - 1, -1, -1):
-                        sentence_len = len(current_chunk[k]) + (
-                            1 if k < len(current_chunk) - 1 else 0
-                        )
-                        if overlap_size + sentence_len <= self.chunk_overlap:
-                            overlap_size += sentence_len
-                            overlap_sentences += 1
-                        else:
-                            break
-
-                    # Move start position considering overlap
-                    next_start = i + len(current_chunk) - overlap_sentences
-                    i = max(next_start, i + 1)  # Ensure we make progress
-                else:
-                    # No overlap - move to next sentence after current chunk
-                    i += len(current_chunk)
+            # Take as many sentences as fit in chunk_size, and at least one
+            end = bisect_right(ends, ends[i] + self.chunk_size + 1, i + 1) - 1
+            end = max(end, i + 1)
+            chunks.append(" ".join(sentences[i:end]))
+
+            if self.chunk_overlap > 0:
+                # Start the next chunk at the earliest sentence whose tail of
+                # this chunk still fits in chunk_overlap
+                overlap_start = bisect_left(
+                    ends, ends[end] - 1 - self.chunk_overlap, i, end
+                )
+                i = max(overlap_start, i + 1)  # Ensure we make progress
             else:
-                # No sentences fit, move to next
-                i += 1
+                # No overlap - move to next sentence after current chunk
+                i = end
 
         return chunks
 
@@ -105,20 +121,32 @@ class DocumentProcessor:
         Following lines: Lesson markers and content
         """
         content = self.read_file(file_path)
-        filename = os.path.basename(file_path)
+        return self.process_course_text(content, source=file_path)
+
+    def process_course_text(
+        self, text: str, source: str = "<memory>"
+    ) -> Tuple[Course, List[CourseChunk]]:
+        """
+        Process course content already held in memory.
 
-        lines = content.strip().split("\n")
+        Args:
+            text: Course document content in the process_course_document format
+            source: Path or label the text came from, its basename is the
+                fallback course title
+
+        Returns:
+            Tuple of the parsed course and its chunks
+        """
+        lines = text.strip().split("\n")
 
         # Extract course metadata from first three lines
-        course_title = filename  # Default fallback
+        course_title = os.path.basename(source)  # Default fallback
         course_link = None
         instructor_name = "Unknown"
 
         # Parse course title from first line
         if len(lines) >= 1 and lines[0].strip():
-            title_match = re.match(
-                r"^Course Title:\s*(.+)$", lines[0].strip(), re.IGNORECASE
-            )
+            title_match = _TITLE_RE.match(lines[0].strip())
             if title_match:
                 course_title = title_match.group(1).strip()
             else:
@@ -131,15 +159,13 @@ class DocumentProcessor:
                 continue
 
             # Try to match course link
-            link_match = re.match(r"^Course Link:\s*(.+)$", line, re.IGNORECASE)
+            link_match = _COURSE_LINK_RE.match(line)
             if link_match:
                 course_link = link_match.group(1).strip()
                 continue
 
             # Try to match instructor
-            instructor_match = re.match(
-                r"^Course Instructor:\s*(.+)$", line, re.IGNORECASE
-            )
+            instructor_match = _INSTRUCTOR_RE.match(line)
             if instructor_match:
                 instructor_name = instructor_match.group(1).strip()
                 continue
@@ -169,9 +195,7 @@ class DocumentProcessor:
             line = lines[i]
 
             # Check for lesson markers (e.g., "Lesson 0: Introduction")
-            lesson_match = re.match(
-                r"^Lesson\s+(\d+):\s*(.+)$", line.strip(), re.IGNORECASE
-            )
+            lesson_match = _LESSON_RE.match(line.strip())
 
             if lesson_match:
                 # Process previous lesson if it exists
@@ -215,9 +239,7 @@ class DocumentProcessor:
                 # Check if next line is a lesson link
                 if i + 1 < len(lines):
                     next_line = lines[i + 1].strip()
-                    link_match = re.match(
-                        r"^Lesson Link:\s*(.+)$", next_line, re.IGNORECASE
-                    )
+                    link_match = _LESSON_LINK_RE.match(next_line)
                     if link_match:
                         lesson_link = link_match.group(1).strip()
                         i += 1  # Skip the link line so it's not added to content
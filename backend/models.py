@@ -18,6 +18,7 @@ class Course(BaseModel):
     course_link: Optional[str] = None  # URL link to the course
     instructor: Optional[str] = None  # Course instructor name (optional metadata)
     lessons: List[Lesson] = []  # List of lessons in this course
+    content_hash: Optional[str] = None  # SHA-256 of the source file, to skip unchanged re-ingests
 
 
 class CourseChunk(BaseModel):
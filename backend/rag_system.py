@@ -1,9 +1,10 @@
 import os
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from ai_generator import AIGenerator
 from document_processor import DocumentProcessor
 from models import Course, CourseChunk, Lesson
+from response_cache import SemanticResponseCache
 from search_tools import CourseSearchTool, ToolManager
 from session_manager import SessionManager
 from vector_store import VectorStore
@@ -18,12 +19,32 @@ class RAGSystem:
         # Initialize core components
         self.document_processor = DocumentProcessor(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
         self.vector_store = VectorStore(config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS)
-        self.ai_generator = AIGenerator(config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL, config.ANTHROPIC_BASE_URL)
+
+        # Semantic response cache shares the vector store's client and embedder
+        self.response_cache = None
+        if config.RESPONSE_CACHE_ENABLED:
+            self.response_cache = SemanticResponseCache(
+                self.vector_store.client,
+                self.vector_store.embedding_function,
+                threshold=config.RESPONSE_CACHE_THRESHOLD,
+                ttl_seconds=config.RESPONSE_CACHE_TTL,
+            )
+
+        self.ai_generator = AIGenerator(
+            config.ANTHROPIC_API_KEY,
+            config.ANTHROPIC_MODEL,
+            config.ANTHROPIC_BASE_URL,
+            response_cache=self.response_cache,
+        )
         self.session_manager = SessionManager(config.MAX_HISTORY)
 
         # Initialize search tools
         self.tool_manager = ToolManager()
-        self.search_tool = CourseSearchTool(self.vector_store)
+        self.search_tool = CourseSearchTool(
+            self.vector_store,
+            semantic_threshold=config.SEARCH_CACHE_THRESHOLD,
+            semantic_cache_size=config.SEARCH_CACHE_SIZE,
+        )
         self.tool_manager.register_tool(self.search_tool)
 
     def add_course_document(self, file_path: str) -> Tuple[Course, int]:
@@ -41,12 +62,14 @@ class RAGSystem:
             course, course_chunks = self.document_processor.process_course_document(
                 file_path
             )
+            course.content_hash = self.document_processor.compute_file_hash(file_path)
 
             # Add course metadata to vector store for semantic search
             self.vector_store.add_course_metadata(course)
 
             # Add course content chunks to vector store
             self.vector_store.add_course_content(course_chunks)
+            self._refresh_response_cache_namespace()
 
             return course, len(course_chunks)
         except Exception as e:
@@ -64,7 +87,7 @@ class RAGSystem:
             clear_existing: Whether to clear existing data first
 
         Returns:
-            Tuple of (total courses added, total chunks created)
+            Tuple of (total courses added or updated, total chunks created)
         """
         total_courses = 0
         total_chunks = 0
@@ -78,8 +101,10 @@ class RAGSystem:
             print(f"Folder {folder_path} does not exist")
             return 0, 0
 
-        # Get existing course titles to avoid re-processing
+        # Get existing course titles and file hashes to avoid re-processing
         existing_course_titles = set(self.vector_store.get_existing_course_titles())
+        existing_hashes = self.vector_store.get_existing_course_hashes()
+        loaded_titles = set()  # Courses written by this call
 
         # Process each file in the folder
         for file_name in os.listdir(folder_path):
@@ -88,29 +113,58 @@ class RAGSystem:
                 (".pdf", ".docx", ".txt")
             ):
                 try:
-                    # Check if this course might already exist
-                    # We'll process the document to get the course ID, but only add if new
+                    # Unchanged files were already ingested, skip parsing and embedding
+                    content_hash = self.document_processor.compute_file_hash(file_path)
+                    if content_hash in existing_hashes:
+                        print(f"Unchanged file already loaded: {file_name} - skipping")
+                        continue
+
+                    # Process the document to get the course ID
                     course, course_chunks = (
                         self.document_processor.process_course_document(file_path)
                     )
+                    if not course:
+                        continue
+                    course.content_hash = content_hash
 
-                    if course and course.title not in existing_course_titles:
+                    if course.title in loaded_titles:
+                        # Another file in this folder already provided this course
+                        print(f"Course already exists: {course.title} - skipping")
+                        continue
+                    if course.title not in existing_course_titles:
                         # This is a new course - add it to the vector store
                         self.vector_store.add_course_metadata(course)
                         self.vector_store.add_course_content(course_chunks)
-                        total_courses += 1
-                        total_chunks += len(course_chunks)
                         print(
                             f"Added new course: {course.title} ({len(course_chunks)} chunks)"
                         )
-                        existing_course_titles.add(course.title)
-                    elif course:
-                        print(f"Course already exists: {course.title} - skipping")
+                    else:
+                        # Edited since it was loaded, or loaded before hashes were
+                        # recorded, so nothing shows it is unchanged: replace it
+                        self.vector_store.replace_course(course, course_chunks)
+                        print(
+                            f"Updated course: {course.title} ({len(course_chunks)} chunks)"
+                        )
+                    total_courses += 1
+                    total_chunks += len(course_chunks)
+                    loaded_titles.add(course.title)
+                    existing_hashes.add(content_hash)
                 except Exception as e:
                     print(f"Error processing {file_name}: {e}")
 
+        self._refresh_response_cache_namespace()
+
         return total_courses, total_chunks
 
+    def _refresh_response_cache_namespace(self):
+        """Re-scope cached answers and drop cached searches after catalog changes"""
+        self.search_tool.clear_cache()
+        self.ai_generator.clear_local_cache()
+        if self.response_cache is not None:
+            self.response_cache.set_namespace(
+                self.vector_store.get_existing_course_titles()
+            )
+
     def query(
         self, query: str, session_id: Optional[str] = None
     ) -> Tuple[str, List[str]]:
@@ -132,19 +186,21 @@ class RAGSystem:
         if session_id:
             history = self.session_manager.get_conversation_history(session_id)
 
+        # Per-query tracking state, so concurrent queries can't see or reset
+        # each other's sources
+        tool_manager = self.tool_manager.fork()
+
         # Generate response using AI with tools
         response = self.ai_generator.generate_response(
             query=prompt,
             conversation_history=history,
-            tools=self.tool_manager.get_tool_definitions(),
-            tool_manager=self.tool_manager,
+            tools=tool_manager.get_tool_definitions(),
+            tool_manager=tool_manager,
+            cache_key=query,
         )
 
         # Get sources from the search tool
-        sources = self.tool_manager.get_last_sources()
-
-        # Reset sources after retrieving them
-        self.tool_manager.reset_sources()
+        sources = tool_manager.get_last_sources()
 
         # Update conversation history
         if session_id:
@@ -153,9 +209,50 @@ class RAGSystem:
         # Return response with sources from tool searches
         return response, sources
 
+    def query_stream(
+        self, query: str, session_id: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Process a user query like query(), streaming the answer as it is generated.
+
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+
+        Returns:
+            Iterator of events: {"type": "delta", "text": ...} for each text chunk,
+            then a final {"type": "done", "sources": [...]}
+        """
+        prompt = f"""Answer this question about course materials: {query}"""
+
+        history = None
+        if session_id:
+            history = self.session_manager.get_conversation_history(session_id)
+
+        tool_manager = self.tool_manager.fork()
+
+        chunks = []
+        for text in self.ai_generator.generate_response_stream(
+            query=prompt,
+            conversation_history=history,
+            tools=tool_manager.get_tool_definitions(),
+            tool_manager=tool_manager,
+            cache_key=query,
+        ):
+            chunks.append(text)
+            yield {"type": "delta", "text": text}
+
+        sources = tool_manager.get_last_sources()
+
+        if session_id:
+            self.session_manager.add_exchange(session_id, query, "".join(chunks))
+
+        yield {"type": "done", "sources": sources}
+
     def get_course_analytics(self) -> Dict:
         """Get analytics about the course catalog"""
+        titles, count = self.vector_store.get_analytics()
         return {
-            "total_courses": self.vector_store.get_course_count(),
-            "course_titles": self.vector_store.get_existing_course_titles(),
+            "total_courses": count,
+            "course_titles": titles,
         }
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+
+
+@dataclass
+class CachedResponse:
+    """A previously generated answer served from the response cache"""
+
+    text: str
+    sources: List[str] = field(default_factory=list)
+
+
+class SemanticResponseCache:
+    """Semantic cache of final answers keyed by query embedding, stored in ChromaDB"""
+
+    def __init__(
+        self,
+        chroma_client,
+        embedding_function,
+        threshold: float = 0.92,
+        ttl_seconds: int = 3600,
+        history_tail_chars: int = 500,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.history_tail_chars = history_tail_chars
+        self.namespace = ""
+
+        # Cosine space so distances map directly to 1 - similarity
+        self.collection = chroma_client.get_or_create_collection(
+            name="response_cache",
+            embedding_function=embedding_function,
+            metadata={"hnsw:space": "cosine"},
+        )
+
+    def set_namespace(self, course_titles: Iterable[str]):
+        """Scope entries to the current course set so document updates invalidate them"""
+        titles = "\n".join(sorted(course_titles))
+        namespace = hashlib.sha1(titles.encode("utf-8")).hexdigest()
+        if namespace == self.namespace:
+            return
+        self.namespace = namespace
+
+        # Entries from earlier course sets can never be hit again, drop them
+        try:
+            self.collection.delete(where={"namespace": {"$ne": self.namespace}})
+        except Exception as e:
+            print(f"Error purging response cache: {e}")
+
+    def _cache_text(self, query: str, conversation_history: Optional[str]) -> str:
+        """Build the text that gets embedded: query plus the tail of the history"""
+        if not conversation_history:
+            return query
+        return f"{conversation_history[-self.history_tail_chars:]}\n{query}"
+
+    def _entry_id(self, cache_text: str) -> str:
+        """Deterministic ID so re-asking the exact same question overwrites the entry"""
+        key = f"{self.namespace}\n{cache_text}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def lookup(
+        self, query: str, conversation_history: Optional[str] = None
+    ) -> Optional[CachedResponse]:
+        """
+        Find a cached answer for a semantically equivalent query.
+
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+
+        Returns:
+            CachedResponse on a fresh hit above the similarity threshold, else None
+        """
+        try:
+            results = self.collection.query(
+                query_texts=[self._cache_text(query, conversation_history)],
+                n_results=1,
+                where={"namespace": self.namespace},
+            )
+            if not results["ids"][0]:
+                return None
+
+            metadata = results["metadatas"][0][0]
+            if time.time() - metadata["created_at"] > self.ttl_seconds:
+                self.collection.delete(ids=[results["ids"][0][0]])
+                return None
+
+            if 1 - results["distances"][0][0] < self.threshold:
+                return None
+
+            return CachedResponse(
+                text=metadata["response"],
+                sources=json.loads(metadata["sources_json"]),
+            )
+        except Exception as e:
+            print(f"Error reading response cache: {e}")
+            return None
+
+    def store(
+        self,
+        query: str,
+        conversation_history: Optional[str],
+        text: str,
+        sources: Optional[List[str]] = None,
+    ):
+        """Store a generated answer for future semantic lookups"""
+        cache_text = self._cache_text(query, conversation_history)
+        try:
+            self.collection.upsert(
+                documents=[cache_text],
+                metadatas=[
+                    {
+                        "namespace": self.namespace,
+                        "response": text,
+                        "sources_json": json.dumps(sources or []),
+                        "created_at": time.time(),
+                    }
+                ],
+                ids=[self._entry_id(cache_text)],
+            )
+        except Exception as e:
+            print(f"Error writing response cache: {e}")
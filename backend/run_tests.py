@@ -4,7 +4,6 @@ Test runner script for the RAG system backend tests.
 
 This script provides a convenient way to run tests with different configurations.
 """
-import subprocess
 import sys
 import argparse
 from pathlib import Path
@@ -12,6 +11,8 @@ from pathlib import Path
 
 def run_pytest(args):
     """Run pytest with the given arguments."""
+    import subprocess
+
     cmd = ["uv", "run", "pytest"] + args
     print(f"Running: {' '.join(cmd)}")
     result = subprocess.run(cmd, cwd=Path(__file__).parent)
@@ -31,7 +32,7 @@ def main():
     parser.add_argument("--file", "-f", help="Run specific test file")
     parser.add_argument("--function", "-k", help="Run tests matching keyword")
     parser.add_argument("--failed", action="store_true", help="Run only failed tests from last run")
-    parser.add_argument("--parallel", "-n", type=int, help="Run tests in parallel")
+    parser.add_argument("--parallel", "-n", type=int, help="Run tests in parallel (requires pytest-xdist)")
 
     args, unknown_args = parser.parse_known_args()
 
@@ -87,7 +88,8 @@ def main():
 
     # Add parallel execution
     if args.parallel:
-        pytest_args.extend(["-n", str(args.parallel)])
+        # loadgroup honours xdist_group markers and spreads the rest per test
+        pytest_args.extend(["-n", str(args.parallel), "--dist", "loadgroup"])
 
     # Add any additional arguments
     pytest_args.extend(unknown_args)
@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+import threading
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
+import numpy as np
 from vector_store import SearchResults, VectorStore
 
 
@@ -22,13 +26,37 @@ class Tool(ABC):
 class CourseSearchTool(Tool):
     """Tool for searching course content with semantic course name matching"""
 
-    def __init__(self, vector_store: VectorStore):
+    # Rows added each time the semantic cache arrays fill up
+    _SEMANTIC_GROWTH = 64
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        semantic_threshold: Optional[float] = None,
+        semantic_cache_size: int = 500,
+    ):
         self.store = vector_store
         self.last_sources = []  # Track sources from last search
 
-    def get_tool_definition(self) -> Dict[str, Any]:
-        """Return Anthropic tool definition for this tool"""
-        return {
+        # Exact-match LRU of (result, sources) by (query, course_name, lesson_number)
+        self._search_cache: OrderedDict = OrderedDict()
+        self._search_cache_max = 1024
+        self._cache_lock = threading.Lock()
+
+        # Semantic LRU for near-duplicate queries with the same filters, enabled
+        # by semantic_threshold (minimum cosine similarity). Arrays are allocated
+        # on first store, once the embedding size is known, and grow in blocks
+        # of _SEMANTIC_GROWTH rows up to semantic_cache_size
+        self.semantic_threshold = semantic_threshold
+        self.semantic_cache_size = semantic_cache_size
+        self._semantic_vectors: Optional[np.ndarray] = None  # Unit-norm queries
+        self._semantic_filters: Optional[np.ndarray] = None  # Filter id per row
+        self._semantic_last_used: Optional[np.ndarray] = None
+        self._semantic_values: List[Tuple[str, Tuple[str, ...]]] = []
+        self._filter_ids: Dict[tuple, int] = {}
+        self._semantic_clock = 0
+        # Built once; callers treat it as read-only
+        self._tool_def = {
             "name": "search_course_content",
             "description": "Search course materials with smart course name matching and lesson filtering",
             "input_schema": {
@@ -51,6 +79,10 @@ class CourseSearchTool(Tool):
             },
         }
 
+    def get_tool_definition(self) -> Dict[str, Any]:
+        """Return Anthropic tool definition for this tool"""
+        return self._tool_def
+
     def execute(
         self,
         query: str,
@@ -68,15 +100,69 @@ class CourseSearchTool(Tool):
         Returns:
             Formatted search results or error message
         """
+        result, sources = self.execute_with_sources(query, course_name, lesson_number)
+        if sources:
+            self.last_sources = sources
+        return result
 
-        # Use the vector store's unified search interface
-        results = self.store.search(
-            query=query, course_name=course_name, lesson_number=lesson_number
-        )
+    def execute_with_sources(
+        self,
+        query: str,
+        course_name: Optional[str] = None,
+        lesson_number: Optional[int] = None,
+    ) -> Tuple[str, List[str]]:
+        """
+        Execute the search without touching shared state, so calls can run concurrently.
 
-        # Handle errors
+        Args:
+            query: What to search for
+            course_name: Optional course filter
+            lesson_number: Optional lesson filter
+
+        Returns:
+            Tuple of (formatted results or error message, sources for the UI)
+        """
+        # Repeated identical searches skip embedding and the ANN lookup
+        cache_key = (query, course_name, lesson_number)
+        with self._cache_lock:
+            cached = self._search_cache.get(cache_key)
+            if cached is not None:
+                self._search_cache.move_to_end(cache_key)
+        if cached is not None:
+            result, sources = cached
+            return result, list(sources)
+
+        # Near-duplicate searches reuse a cached result, and misses pass the
+        # embedding on so the store doesn't compute it again
+        query_embedding = query_vector = filter_id = None
+        if self.semantic_threshold is not None:
+            query_embedding, query_vector = self._embed_query(query)
+        if query_vector is not None:
+            with self._cache_lock:
+                filter_id = self._filter_ids.setdefault(
+                    (course_name, lesson_number), len(self._filter_ids)
+                )
+                cached = self._semantic_lookup(query_vector, filter_id)
+            if cached is not None:
+                result, sources = cached
+                return result, list(sources)
+
+        # Use the vector store's unified search interface
+        if query_embedding is not None:
+            results = self.store.search(
+                query=query,
+                course_name=course_name,
+                lesson_number=lesson_number,
+                query_embedding=query_embedding,
+            )
+        else:
+            results = self.store.search(
+                query=query, course_name=course_name, lesson_number=lesson_number
+            )
+
+        # Handle errors, which are not cached so the next call retries
         if results.error:
-            return results.error
+            return results.error, []
 
         # Handle empty results
         if results.is_empty():
@@ -85,53 +171,174 @@ class CourseSearchTool(Tool):
                 filter_info += f" in course '{course_name}'"
             if lesson_number:
                 filter_info += f" in lesson {lesson_number}"
-            return f"No relevant content found{filter_info}."
-
-        # Format and return results
-        return self._format_results(results)
+            result, sources = f"No relevant content found{filter_info}.", []
+        else:
+            result, sources = self._format_results_with_sources(results)
+
+        entry = (result, tuple(sources))
+        with self._cache_lock:
+            self._search_cache[cache_key] = entry
+            if len(self._search_cache) > self._search_cache_max:
+                self._search_cache.popitem(last=False)
+            if query_vector is not None:
+                self._semantic_store(query_vector, filter_id, entry)
+
+        return result, sources
+
+    def clear_cache(self):
+        """Drop cached searches, e.g. after course content changes"""
+        with self._cache_lock:
+            self._search_cache.clear()
+            self._semantic_values.clear()
+
+    def _embed_query(self, query: str):
+        """Return the store's query embedding and a unit-norm copy, or (None, None)"""
+        try:
+            embedding = np.asarray(self.store.embed_query(query), dtype=np.float32)
+        except Exception as e:
+            print(f"Error embedding query for search cache: {e}")
+            return None, None
+        norm = np.linalg.norm(embedding)
+        if embedding.ndim != 1 or not norm:
+            return None, None
+        return embedding, embedding / norm
+
+    def _semantic_lookup(
+        self, query_vector: np.ndarray, filter_id: int
+    ) -> Optional[Tuple[str, Tuple[str, ...]]]:
+        """Find the closest cached search with these filters; caller holds the lock"""
+        count = len(self._semantic_values)
+        if not count or self._semantic_vectors.shape[1] != query_vector.shape[0]:
+            return None
+
+        # One matmul scores every cached query; other filters can never match
+        similarities = self._semantic_vectors[:count] @ query_vector
+        similarities[self._semantic_filters[:count] != filter_id] = -1.0
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.semantic_threshold:
+            return None
+
+        self._semantic_clock += 1
+        self._semantic_last_used[best] = self._semantic_clock
+        return self._semantic_values[best]
+
+    def _semantic_store(
+        self,
+        query_vector: np.ndarray,
+        filter_id: int,
+        entry: Tuple[str, Tuple[str, ...]],
+    ):
+        """Add a search to the semantic cache, evicting LRU; caller holds the lock"""
+        size = self.semantic_cache_size
+        dim = query_vector.shape[0]
+        if self._semantic_vectors is None or self._semantic_vectors.shape[1] != dim:
+            self._semantic_vectors = np.empty((0, dim), dtype=np.float32)
+            self._semantic_filters = np.empty(0, dtype=np.int64)
+            self._semantic_last_used = np.zeros(0, dtype=np.int64)
+            self._semantic_values.clear()
+
+        count = len(self._semantic_values)
+        if count == len(self._semantic_vectors) and count < size:
+            self._grow_semantic_arrays(min(count + self._SEMANTIC_GROWTH, size))
+        if count < size:
+            slot = count
+            self._semantic_values.append(entry)
+        else:
+            slot = int(np.argmin(self._semantic_last_used))
+            self._semantic_values[slot] = entry
+
+        self._semantic_vectors[slot] = query_vector
+        self._semantic_filters[slot] = filter_id
+        self._semantic_clock += 1
+        self._semantic_last_used[slot] = self._semantic_clock
+
+    def _grow_semantic_arrays(self, capacity: int):
+        """Resize the semantic cache arrays to capacity rows, keeping stored rows"""
+        count = len(self._semantic_values)
+        dim = self._semantic_vectors.shape[1]
+        vectors = np.empty((capacity, dim), dtype=np.float32)
+        vectors[:count] = self._semantic_vectors[:count]
+        filters = np.empty(capacity, dtype=np.int64)
+        filters[:count] = self._semantic_filters[:count]
+        last_used = np.zeros(capacity, dtype=np.int64)
+        last_used[:count] = self._semantic_last_used[:count]
+        self._semantic_vectors = vectors
+        self._semantic_filters = filters
+        self._semantic_last_used = last_used
 
     def _format_results(self, results: SearchResults) -> str:
         """Format search results with course and lesson context"""
-        formatted = []
-        sources = []  # Track sources for the UI
-
-        for doc, meta in zip(results.documents, results.metadata):
-            course_title = meta.get('course_title', 'unknown')
-            lesson_num = meta.get('lesson_number')
-            lesson_link = meta.get('lesson_link')
-
-            # Build context header with clickable lesson link if available
-            header = f"[{course_title}"
-            if lesson_num is not None:
-                if lesson_link:
-                    # Create clickable lesson link
-                    lesson_html = f'<a href="{lesson_link}" target="_blank" class="lesson-link">Lesson {lesson_num}</a>'
-                    header += f" - {lesson_html}"
-                else:
-                    header += f" - Lesson {lesson_num}"
-            header += "]"
-
-          # Track source for the UI (plain text version)
-            source = course_title
-            if lesson_num is not None:
-                source += f" - Lesson {lesson_num}"
-            sources.append(source)
-
-            formatted.append(f"{header}\n{doc}")
+        formatted, sources = self._format_results_with_sources(results)
 
         # Store sources for retrieval
         self.last_sources = sources
 
-        return "\n\n".join(formatted)
+        return formatted
+
+    def _format_results_with_sources(
+        self, results: SearchResults
+    ) -> Tuple[str, List[str]]:
+        """Format search results and collect their sources without storing them"""
+        entries = [self._header_and_source(meta) for meta in results.metadata]
+        formatted = "\n\n".join(
+            f"{header}\n{doc}" for (header, _), doc in zip(entries, results.documents)
+        )
+        # Track the plain text sources for the UI
+        return formatted, [source for _, source in entries]
+
+    @classmethod
+    def _header_and_source(cls, meta: Mapping[str, Any]) -> Tuple[str, str]:
+        """Build a result's context header, with a clickable lesson link if available"""
+        # Metadata always has the same three keys, so read each once and
+        # format from locals
+        return cls._format_header(
+            meta.get("course_title", "unknown"),
+            meta.get("lesson_number"),
+            meta.get("lesson_link"),
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _format_header(
+        course_title: str, lesson_number: Optional[int], lesson_link: Optional[str]
+    ) -> Tuple[str, str]:
+        """Return the (header, source) pair for one result's metadata values.
+
+        Memoized, since the same lessons come back across searches.
+        """
+        if lesson_number is None:
+            return f"[{course_title}]", course_title
+
+        source = f"{course_title} - Lesson {lesson_number}"
+        if lesson_link:
+            header = (
+                f"[{course_title} - "
+                f'<a href="{lesson_link}" target="_blank" class="lesson-link">'
+                f"Lesson {lesson_number}</a>]"
+            )
+            return header, source
+        return f"[{source}]", source
 
 
 class ToolManager:
     """Manages available tools for the AI with enhanced source tracking for sequential calls"""
 
-    def __init__(self):
+    def __init__(self, track_timings: bool = False):
         self.tools = {}
-        self.all_sources = []  # Track all sources across sequential calls
+        self.track_timings = track_timings  # Stamp call_history records with time.time()
+        self._tool_defs_list = []  # Tool definitions, rebuilt only on registration
+        self._tools_with_sources = {}  # Tools exposing last_sources, in registration order
+        # Track all sources across sequential calls (insertion-ordered set)
+        self._all_sources: "OrderedDict[str, None]" = OrderedDict()
         self.call_history = []  # Track all tool executions in sequence
+        self._last_sources: list = []  # Sources of this manager's latest search
+
+        # Exact-match LRU of (result, sources) for repeated identical tool calls
+        self._exec_cache: OrderedDict = OrderedDict()
+        self._exec_cache_max = 128
+
+        # Guards shared tracking state when tools run concurrently
+        self._lock = threading.Lock()
 
     def register_tool(self, tool: Tool):
         """Register any tool that implements the Tool interface"""
@@ -140,48 +347,110 @@ class ToolManager:
         if not tool_name:
             raise ValueError("Tool must have a 'name' in its definition")
         self.tools[tool_name] = tool
+        if hasattr(tool, "last_sources"):
+            self._tools_with_sources[tool_name] = tool
+        else:
+            self._tools_with_sources.pop(tool_name, None)
+
+        # New list object so callers holding the previous one see it as changed
+        self._tool_defs_list = [
+            d for d in self._tool_defs_list if d.get("name") != tool_name
+        ] + [tool_def]
 
     def get_tool_definitions(self) -> list:
         """Get all tool definitions for Anthropic tool calling"""
-        return [tool.get_tool_definition() for tool in self.tools.values()]
+        return self._tool_defs_list
 
     def execute_tool(self, tool_name: str, **kwargs) -> str:
         """Execute a tool by name with given parameters"""
-        if tool_name not in self.tools:
+        tool = self.tools.get(tool_name)
+        if tool is None:
             return f"Tool '{tool_name}' not found"
+        has_sources = tool_name in self._tools_with_sources
 
         # Record the tool call for sequential tracking
-        call_record = {
-            'tool': tool_name,
-            'params': kwargs,
-            'timestamp': time.time()
-        }
-        self.call_history.append(call_record)
+        call_record = {'tool': tool_name, 'params': kwargs}
+        if self.track_timings:
+            call_record['timestamp'] = time.time()
+
+        cache_key = self._exec_cache_key(tool_name, kwargs)
+
+        with self._lock:
+            self.call_history.append(call_record)
+            cached = self._exec_cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                self._exec_cache.move_to_end(cache_key)
+
+        if cached is not None:
+            # Reuse the previous identical call and its sources
+            result, tool_sources = cached
+        elif hasattr(tool, 'execute_with_sources'):
+            # Execute the tool outside the lock; sources come back with the result
+            result, tool_sources = tool.execute_with_sources(**kwargs)
+        else:
+            # Execute the tool and collect sources from this execution
+            result = tool.execute(**kwargs)
+            tool_sources = list(tool.last_sources) if has_sources else []
+
+        with self._lock:
+            if cached is None and cache_key is not None and not result.startswith(("Error", "Search error")):
+                self._exec_cache[cache_key] = (result, tool_sources)
+                if len(self._exec_cache) > self._exec_cache_max:
+                    self._exec_cache.popitem(last=False)
+
+            # Expose sources for the UI
+            if tool_sources and has_sources:
+                tool.last_sources = list(tool_sources)
+                self._last_sources = list(tool_sources)
+
+            # Add to all_sources with deduplication
+            for source in tool_sources:
+                self._all_sources.setdefault(source, None)
 
-        # Execute the tool
-        result = self.tools[tool_name].execute(**kwargs)
+        return result
 
-        # Collect sources from this execution
-        tool_sources = self.tools[tool_name].last_sources if hasattr(self.tools[tool_name], 'last_sources') else []
+    @staticmethod
+    def _exec_cache_key(tool_name: str, kwargs: Dict[str, Any]) -> Optional[tuple]:
+        """Build a hashable cache key for a tool call, or None if params are unhashable"""
+        key = (tool_name, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def fork(self) -> "ToolManager":
+        """
+        Create a manager sharing the registered tools but with its own tracking state.
 
-        # Add to all_sources with deduplication
-        for source in tool_sources:
-            if source not in self.all_sources:
-                self.all_sources.append(source)
+        Tools are shared between requests, so each query runs on a fork to
+        keep its sources, call history and cached tool results to itself.
 
-        return result
+        Returns:
+            New ToolManager with the same tools and tool definitions
+        """
+        manager = ToolManager(track_timings=self.track_timings)
+        manager.tools = dict(self.tools)
+        manager._tools_with_sources = dict(self._tools_with_sources)
+        # Same list object, so the AI generator's tools cache stays valid
+        manager._tool_defs_list = self._tool_defs_list
+        return manager
 
     def get_last_sources(self) -> list:
-        """Get sources from the most recent search operation"""
-        # Check all tools for last_sources attribute
-        for tool in self.tools.values():
-            if hasattr(tool, "last_sources") and tool.last_sources:
-                return tool.last_sources
-        return []
+        """Get sources from this manager's most recent search operation"""
+        return self._last_sources
+
+    def restore_sources(self, sources: list):
+        """Restore sources recorded alongside a cached response"""
+        for tool in self._tools_with_sources.values():
+            tool.last_sources = list(sources)
+            break
+        self._last_sources = list(sources)
+        self._all_sources = OrderedDict.fromkeys(sources)
 
     def get_all_sources(self) -> list:
         """Get all sources from sequential tool executions"""
-        return self.all_sources.copy()
+        return list(self._all_sources)
 
     def get_call_history(self) -> list:
         """Get the history of all tool executions in sequence"""
@@ -189,13 +458,14 @@ class ToolManager:
 
     def reset_sources(self):
         """Reset sources from all tools that track sources"""
-        for tool in self.tools.values():
-            if hasattr(tool, 'last_sources'):
-                tool.last_sources = []
+        for tool in self._tools_with_sources.values():
+            tool.last_sources = []
+        self._last_sources = []
 
-        # Also reset sequential tracking
-        self.all_sources.clear()
+        # Also reset sequential tracking and cached tool results
+        self._all_sources.clear()
         self.call_history.clear()
+        self._exec_cache.clear()
 
     def get_sequential_summary(self) -> str:
         """Get a summary of sequential tool execution for context"""
@@ -219,6 +489,6 @@ class ToolManager:
 
             summary_parts.append(call_desc)
 
-        summary_parts.append(f"Sources from {len(self.all_sources)} locations")
+        summary_parts.append(f"Sources from {len(self._all_sources)} locations")
 
         return "\n".join(summary_parts)
@@ -1,92 +1,182 @@
 #!/usr/bin/env python3
 """Test the actual document loading behavior"""
 
+import functools
+import multiprocessing
 import os
 import sys
-from pathlib import Path
-
-# Add current directory to path
-current_dir = Path(__file__).parent
-sys.path.insert(0, str(current_dir))
-
-from rag_system import RAGSystem
-from config import config
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# Flush pending chunks to the vector store once this many have accumulated
+BATCH_SIZE = 512
+
+COURSE_FILE_SUFFIXES = frozenset({'.txt', '.pdf', '.docx'})
+
+@functools.lru_cache(maxsize=8)
+def _list_course_files(docs_path, mtime_ns):
+    """
+    Return the course file paths in docs_path as a tuple.
+
+    Keyed on the directory's mtime so repeated runs in one interpreter skip
+    the scan until files are added, removed or renamed.
+    """
+    # DirEntry carries the file type from readdir, so no extra stat per file
+    with os.scandir(docs_path) as entries:
+        return tuple(
+            entry.path for entry in entries
+            if entry.is_file()
+            and os.path.splitext(entry.name)[1].lower() in COURSE_FILE_SUFFIXES
+        )
+
+def iter_parsed_documents(processor, course_files, max_workers=None):
+    """
+    Parse course files in worker processes, yielding them as they complete.
+
+    Takes file paths and yields (path, future) pairs. Parsing is CPU-bound,
+    so processes sidestep the GIL; only one file per worker is in flight at
+    a time, so memory stays bounded however many files there are.
+
+    Workers are spawned rather than forked: by now RAGSystem has started
+    Chroma and torch threads, and forking a threaded process can deadlock.
+    """
+    course_files = list(course_files)
+    if not course_files:
+        return
+    max_workers = min(len(course_files), max_workers or os.cpu_count() or 1)
+    remaining = iter(course_files)
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        in_flight = {}
+
+        def submit(file_path):
+            future = executor.submit(processor.process_course_document, file_path)
+            in_flight[future] = file_path
+
+        for file_path in remaining:
+            submit(file_path)
+            if len(in_flight) >= max_workers:
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path = in_flight.pop(future)
+                next_path = next(remaining, None)
+                if next_path is not None:
+                    submit(next_path)
+                yield file_path, future
 
 def test_current_behavior():
     """Test what happens when we call add_course_folder with existing data"""
-
-    print("=== Testing Current Document Loading Behavior ===")
-
-    # Create RAG system
-    rag_system = RAGSystem(config)
-
-    # Check existing data
-    print("\n1. Before loading:")
-    existing_titles = rag_system.vector_store.get_existing_course_titles()
-    course_count = rag_system.vector_store.get_course_count()
-    print(f"   Existing courses: {existing_titles}")
-    print(f"   Course count: {course_count}")
-
-    # Try to load documents
-    docs_path = "../docs"
-    if os.path.exists(docs_path):
-        print(f"\n2. Loading from: {docs_path}")
-
-        # Get existing course titles like the actual code does
-        existing_course_titles = set(rag_system.vector_store.get_existing_course_titles())
-        print(f"   Existing titles set: {existing_course_titles}")
-
-        # Check what files exist
-        files = os.listdir(docs_path)
-        print(f"   Files found: {files}")
-
-        course_files = [f for f in files if f.lower().endswith(('.txt', '.pdf', '.docx'))]
-        print(f"   Course files to process: {course_files}")
-
-        total_courses = 0
-        total_chunks = 0
-
-        # Process each file
-        for file_name in course_files:
-            file_path = os.path.join(docs_path, file_name)
-            print(f"\n   Processing: {file_name}")
-
-            try:
-                # Process the document (this is what the actual code does)
-                course, course_chunks = rag_system.document_processor.process_course_document(file_path)
-
-                if course and course.title not in existing_course_titles:
-                    print(f"     -> NEW course: {course.title} ({len(course_chunks)} chunks)")
-                    # This would add to vector store in real code
-                    rag_system.vector_store.add_course_metadata(course)
-                    rag_system.vector_store.add_course_content(course_chunks)
-                    total_courses += 1
-                    total_chunks += len(course_chunks)
-                    existing_course_titles.add(course.title)
-                elif course:
-                    print(f"     -> EXISTS: {course.title} - skipping")
+    # Imported here so spawned parse workers, which re-import this module,
+    # load only document_processor rather than Chroma and torch
+    from rag_system import RAGSystem
+    from config import config
+
+    # Buffer output and write it once at the end instead of a write per line
+    lines = []
+    emit = lines.append
+
+    try:
+        emit("=== Testing Current Document Loading Behavior ===")
+
+        # Create RAG system
+        rag_system = RAGSystem(config)
+
+        # Check existing data
+        emit("\n1. Before loading:")
+        # Fetched once, as a set like the actual code does, and updated locally
+        titles, count = rag_system.vector_store.get_analytics()
+        existing_course_titles = set(titles)
+        emit(f"   Existing courses: {sorted(existing_course_titles)}")
+        emit(f"   Course count: {count}")
+
+        # Try to load documents
+        docs_path = "../docs"
+        if os.path.exists(docs_path):
+            emit(f"\n2. Loading from: {docs_path}")
+
+            # Check what files exist
+            course_files = _list_course_files(docs_path, os.stat(docs_path).st_mtime_ns)
+            emit(f"   Course files to process: {[os.path.basename(path) for path in course_files]}")
+
+            total_courses = 0
+            total_chunks = 0
+
+            # New courses and chunks are written in batches rather than per file
+            new_courses = []
+            pending_chunks = []
+
+            def flush():
+                rag_system.vector_store.add_courses(new_courses, pending_chunks)
+                new_courses.clear()
+                pending_chunks.clear()
+
+            # Skip the full parse for files whose title is already loaded
+            files_to_parse = []
+            for file_path in course_files:
+                try:
+                    title = rag_system.document_processor.peek_course_title(file_path)
+                except OSError:
+                    title = None
+                if title is not None and title in existing_course_titles:
+                    emit(f"\n   Processing: {os.path.basename(file_path)}")
+                    emit(f"     -> EXISTS: {title} - skipping")
                 else:
-                    print(f"     -> FAILED to process course")
-
-            except Exception as e:
-                print(f"     -> ERROR processing {file_name}: {e}")
-
-        print(f"\n3. Loading results:")
-        print(f"   Total new courses: {total_courses}")
-        print(f"   Total new chunks: {total_chunks}")
-
-    print(f"\n4. After loading:")
-    final_titles = rag_system.vector_store.get_existing_course_titles()
-    final_count = rag_system.vector_store.get_course_count()
-    print(f"   Final course count: {final_count}")
-    print(f"   Final course titles: {final_titles}")
-
-    # This should explain why we get "Loaded 0 courses with 0 chunks"
-    print(f"\n5. CONCLUSION:")
-    print(f"   The system reports '0 courses with 0 chunks' because")
-    print(f"   all courses already exist in vector store, so")
-    print(f"   no new courses are added during startup.")
-    print(f"   The vector store contains {final_count} existing courses.")
+                    files_to_parse.append(file_path)
+
+            # Parse files in parallel; dedup and vector store writes stay on this
+            # process so Chroma has a single writer
+            parsed_documents = iter_parsed_documents(
+                rag_system.document_processor, files_to_parse
+            )
+            for file_path, future in parsed_documents:
+                file_name = os.path.basename(file_path)
+                emit(f"\n   Processing: {file_name}")
+
+                try:
+                    # Process the document (this is what the actual code does)
+                    course, course_chunks = future.result()
+
+                    if course and course.title not in existing_course_titles:
+                        emit(f"     -> NEW course: {course.title} ({len(course_chunks)} chunks)")
+                        new_courses.append(course)
+                        pending_chunks.extend(course_chunks)
+                        if len(pending_chunks) >= BATCH_SIZE:
+                            flush()
+                        total_courses += 1
+                        total_chunks += len(course_chunks)
+                        existing_course_titles.add(course.title)
+                        del course_chunks  # Only the pending batch keeps chunks alive
+                    elif course:
+                        emit(f"     -> EXISTS: {course.title} - skipping")
+                    else:
+                        emit(f"     -> FAILED to process course")
+
+                except Exception as e:
+                    emit(f"     -> ERROR processing {file_name}: {e}")
+
+            flush()
+
+            emit(f"\n3. Loading results:")
+            emit(f"   Total new courses: {total_courses}")
+            emit(f"   Total new chunks: {total_chunks}")
+
+        emit(f"\n4. After loading:")
+        final_titles, final_count = rag_system.vector_store.get_analytics()
+        emit(f"   Final course count: {final_count}")
+        emit(f"   Final course titles: {final_titles}")
+
+        # This should explain why we get "Loaded 0 courses with 0 chunks"
+        emit(f"\n5. CONCLUSION:")
+        emit(f"   The system reports '0 courses with 0 chunks' because")
+        emit(f"   all courses already exist in vector store, so")
+        emit(f"   no new courses are added during startup.")
+        emit(f"   The vector store contains {final_count} existing courses.")
+    finally:
+        sys.stdout.write("\n".join(lines) + "\n")
 
 if __name__ == "__main__":
     test_current_behavior()
\ No newline at end of file
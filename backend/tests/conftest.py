@@ -1,51 +1,94 @@
 """
 Pytest configuration and shared fixtures for RAG system testing.
 """
+import json
 import pytest
-import tempfile
-import shutil
+from contextlib import asynccontextmanager
 from unittest.mock import Mock, AsyncMock
-from pathlib import Path
-import sys
-import os
-
-# Add the backend directory to the Python path for imports
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from types import MappingProxyType
 
 from fastapi.testclient import TestClient
-from app import app
-from rag_system import RAGSystem
-from config import config
+from pydantic import BaseModel
+from typing import List, Optional
 
+try:
+    import orjson
+except ImportError:  # Optional speedup, installed with chromadb
+    orjson = None
 
-@pytest.fixture
-def test_client():
-    """Create a FastAPI test client without static file mounting."""
-    # Create a new FastAPI app for testing without static files
-    from fastapi import FastAPI, HTTPException
-    from fastapi.middleware.cors import CORSMiddleware
-    from fastapi.middleware.trustedhost import TrustedHostMiddleware
-    from pydantic import BaseModel
-    from typing import List, Optional
 
-    test_app = FastAPI(title="Test RAG System", root_path="")
+# Pydantic models for the test app, built once at import
+class QueryRequest(BaseModel):
+    query: str
+    session_id: Optional[str] = None
 
-    # Add middleware
-    test_app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
-    test_app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-        expose_headers=["*"],
-    )
 
-    # Mock RAG system for testing
-    mock_rag_system = Mock(spec=RAGSystem)
+class QueryResponse(BaseModel):
+    answer: str
+    sources: List[str]
+    session_id: str
+
+
+class CourseStats(BaseModel):
+    total_courses: int
+    course_titles: List[str]
+
+
+def response_json(response):
+    """Decode a test client response body, with orjson when it is installed."""
+    if orjson is None:
+        return response.json()
+    return orjson.loads(response.content)
+
+
+def json_bytes(payload) -> bytes:
+    """Encode a request body once, with orjson when it is installed."""
+    if orjson is None:
+        return json.dumps(payload).encode("utf-8")
+    return orjson.dumps(payload)
+
+
+def post_json(client, url, payload):
+    """POST a JSON body, given as an object or as bytes from json_bytes."""
+    body = payload if isinstance(payload, bytes) else json_bytes(payload)
+    return client.post(url, content=body, headers={"Content-Type": "application/json"})
+
+
+# Sources returned by mock_rag_system queries, built once at import
+_CANONICAL_SOURCES = tuple(f"source_{i}.txt: Chunk {i}" for i in range(3))
+
+# Expected default API payloads, read-only so shared fixtures can't be mutated
+_EXPECTED_QUERY_RESPONSE = MappingProxyType({
+    "answer": "This is a test answer about machine learning.",
+    "sources": ["course1_script.txt: Chunk 1", "course2_script.txt: Chunk 3"],
+    "session_id": "test_session_123"
+})
+
+_EXPECTED_COURSE_STATS = MappingProxyType({
+    "total_courses": 2,
+    "course_titles": ["Course 1: Introduction", "Course 2: Advanced Topics"]
+})
+
+
+class FakeRAGSystem:
+    """Stand-in for RAGSystem exposing only the attributes the tests use.
+
+    Each attribute is a plain Mock, so tests keep the Mock assertion API
+    without spec introspection of RAGSystem or importing its dependencies.
+    """
+
+    def __init__(self):
+        self.session_manager = Mock()
+        self.query = Mock()
+        self.get_course_analytics = Mock()
+
+
+def _configure_mock_rag_system(mock_rag_system):
+    """Reset the shared API test stub in place and re-apply its default return values."""
+    for mock in (mock_rag_system.session_manager, mock_rag_system.query, mock_rag_system.get_course_analytics):
+        mock.reset_mock(return_value=True, side_effect=True)
 
     # Mock session manager
-    mock_rag_system.session_manager = Mock()
     mock_rag_system.session_manager.create_session.return_value = "test_session_123"
 
     # Mock query method
@@ -60,19 +103,37 @@ def test_client():
         "course_titles": ["Course 1: Introduction", "Course 2: Advanced Topics"]
     }
 
-    # Pydantic models
-    class QueryRequest(BaseModel):
-        query: str
-        session_id: Optional[str] = None
 
-    class QueryResponse(BaseModel):
-        answer: str
-        sources: List[str]
-        session_id: str
+@pytest.fixture(scope="session")
+def _test_app_client():
+    """Build the test app and start its client once per session."""
+    # Create a new FastAPI app for testing without static files
+    from fastapi import FastAPI, HTTPException
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.middleware.trustedhost import TrustedHostMiddleware
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Counted so tests can check startup runs once for the whole session
+        app.state.lifespan_starts += 1
+        yield
+
+    test_app = FastAPI(title="Test RAG System", root_path="", lifespan=lifespan)
+    test_app.state.lifespan_starts = 0
 
-    class CourseStats(BaseModel):
-        total_courses: int
-        course_titles: List[str]
+    # Add middleware
+    test_app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
+    test_app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["*"],
+    )
+
+    # Mock RAG system for testing, configured per test by test_client
+    mock_rag_system = FakeRAGSystem()
 
     # Store mock in app state for access in endpoints
     test_app.state.mock_rag_system = mock_rag_system
@@ -106,16 +167,51 @@ def test_client():
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
-    return TestClient(test_app)
+    # Entering the client starts the lifespan and one event loop portal that
+    # every request reuses, instead of a fresh portal per request
+    with TestClient(test_app) as client:
+        yield client
+
+
+@pytest.fixture
+def test_client(_test_app_client):
+    """FastAPI test client without static file mounting, with fresh mock state."""
+    _configure_mock_rag_system(_test_app_client.app.state.mock_rag_system)
+    return _test_app_client
+
+
+@pytest.fixture(scope="session")
+def _cached_responses():
+    """Default-state GET responses by path, shared by the session."""
+    return {}
+
+
+@pytest.fixture
+def cached_get(test_client, _cached_responses):
+    """GET a path against the default mock state, dispatching each path once per session.
+
+    test_client has just reset the stub, so call it before changing the stub.
+    """
+    def get(path):
+        if path not in _cached_responses:
+            _cached_responses[path] = test_client.get(path)
+        return _cached_responses[path]
+
+    return get
+
+
+@pytest.fixture
+def cached_courses_response(cached_get):
+    """/api/courses response for the default mock state, fetched once per session."""
+    return cached_get("/api/courses")
 
 
 @pytest.fixture
 def mock_rag_system():
     """Create a mock RAG system for unit tests."""
-    mock_rag = Mock(spec=RAGSystem)
+    mock_rag = FakeRAGSystem()
 
     # Mock session manager
-    mock_rag.session_manager = Mock()
     mock_rag.session_manager.create_session.return_value = "test_session_123"
     mock_rag.session_manager.get_session.return_value = {
         "messages": [
@@ -128,10 +224,8 @@ def mock_rag_system():
     def mock_query(query, session_id):
         if "error" in query.lower():
             raise Exception("Mock error for testing")
-        return (
-            f"Mock answer for: {query}",
-            [f"source_{i}.txt: Chunk {i}" for i in range(3)]
-        )
+        # Copy so a test mutating its sources can't leak into the next call
+        return f"Mock answer for: {query}", list(_CANONICAL_SOURCES)
 
     mock_rag.query.side_effect = mock_query
 
@@ -145,7 +239,7 @@ def mock_rag_system():
     return mock_rag
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_documents():
     """Create sample document data for testing."""
     return {
@@ -176,22 +270,17 @@ def sample_documents():
     }
 
 
-@pytest.fixture
-def temp_docs_dir(sample_documents):
-    """Create a temporary directory with sample documents."""
-    temp_dir = tempfile.mkdtemp()
-    docs_dir = Path(temp_dir) / "docs"
-    docs_dir.mkdir()
+@pytest.fixture(scope="session")
+def temp_docs_dir(tmp_path_factory, sample_documents):
+    """Create a temporary directory with sample documents, shared by the session."""
+    docs_dir = tmp_path_factory.mktemp("docs")
 
     # Create sample document files
     for course_data in sample_documents.values():
         file_path = docs_dir / course_data["filename"]
-        file_path.write_text(course_data["content"])
-
-    yield docs_dir
+        file_path.write_bytes(course_data["content"].encode("utf-8"))
 
-    # Cleanup
-    shutil.rmtree(temp_dir)
+    return docs_dir
 
 
 @pytest.fixture
@@ -241,20 +330,13 @@ def query_request_data():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def expected_query_response():
     """Expected query response structure for API testing."""
-    return {
-        "answer": "This is a test answer about machine learning.",
-        "sources": ["course1_script.txt: Chunk 1", "course2_script.txt: Chunk 3"],
-        "session_id": "test_session_123"
-    }
+    return _EXPECTED_QUERY_RESPONSE
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def expected_course_stats():
     """Expected course statistics response for API testing."""
-    return {
-        "total_courses": 2,
-        "course_titles": ["Course 1: Introduction", "Course 2: Advanced Topics"]
-    }
\ No newline at end of file
+    return _EXPECTED_COURSE_STATS
\ No newline at end of file
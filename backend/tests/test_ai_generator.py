@@ -1,132 +1,254 @@
 import pytest
-from unittest.mock import Mock, patch, MagicMock, AsyncMock
-from typing import List, Dict, Any
-import anthropic
+import re
+from dataclasses import dataclass
+from types import MappingProxyType
+from unittest.mock import Mock, patch, MagicMock, call, create_autospec
 
-from ai_generator import AIGenerator
+from ai_generator import AIGenerator, OrjsonHttpxClient
+from response_cache import CachedResponse
+
+
+# Keep this module's tests on one xdist worker so module-scoped fixtures are
+# built once; run with `pytest -n auto --dist loadgroup`
+pytestmark = pytest.mark.xdist_group("ai_generator_tests")
+
+
+class _FakeAnthropic:
+    """Stand-in for anthropic.Anthropic exposing only the messages API"""
+
+    __slots__ = ("messages",)
+
+    def __init__(self, *args, **kwargs):
+        self.messages = Mock()
+
+
+# Plain data carriers for API responses; the code under test only reads them
+@dataclass(slots=True)
+class _TextBlock:
+    text: str
+    type: str = "text"
+
+
+@dataclass(slots=True)
+class _ToolUseBlock:
+    type: str
+    name: str
+    input: dict
+    id: str
+
+
+@dataclass(slots=True)
+class _Resp:
+    stop_reason: str
+    content: list
+
+
+def _tool_use(name: str, inp: dict, id_: str) -> _ToolUseBlock:
+    return _ToolUseBlock("tool_use", name, inp, id_)
+
+
+def _resp(stop: str, blocks: list) -> _Resp:
+    return _Resp(stop, blocks)
+
+
+def _text_resp(text: str) -> _Resp:
+    return _Resp("end_turn", [_TextBlock(text)])
+
+
+# Response sequences for the sequential tool tests, built once at import
+_SEQ_2ROUND_RESPONSES = (
+    # Round 1: First tool call
+    _resp("tool_use", [_tool_use("search_course_content", {"query": "machine learning"}, "toolu_001")]),
+    # Round 2: Claude reviews the first results and requests a second tool call
+    _resp("tool_use", [_tool_use("search_course_content", {"query": "neural networks", "course_name": "Machine Learning Course"}, "toolu_002")]),
+    # Final answer
+    _text_resp("Comprehensive information about machine learning and neural networks found in the courses."),
+)
+
+# Claude keeps requesting tools; the last round is sent without them
+_SEQ_MAX_ROUNDS_RESPONSES = (
+    *(
+        _resp("tool_use", [_tool_use("search_course_content", {"query": f"query_round_{i+1}"}, f"toolu_{i:03d}")])
+        for i in range(2)
+    ),
+    _text_resp("Final answer after max rounds"),
+)
+
+
+_HISTORY = "User: What is AI?\nAssistant: AI is artificial intelligence..."
+
+# Read-only tool definitions shared by every test
+_SEARCH_TOOL_SCHEMA = MappingProxyType({
+    "name": "search_course_content",
+    "description": "Search course materials",
+    "input_schema": MappingProxyType({
+        "type": "object",
+        "properties": {
+            "query": {"type": "string"},
+            "course_name": {"type": "string"},
+            "lesson_number": {"type": "integer"}
+        },
+        "required": ["query"]
+    })
+})
+SAMPLE_TOOLS = (_SEARCH_TOOL_SCHEMA,)
+sample_tools = SAMPLE_TOOLS
+
+# Very long tool result, built once at import
+_LONG_TOOL_RESULT = "Result: " + "x" * 10000
+
+# Key phrases the static system prompt must contain
+_SYSTEM_EXPECTED = frozenset({"course materials", "search tool", "anthropic", "educational", "brief", "concise"})
+_SYSTEM_RE = re.compile("|".join(map(re.escape, sorted(_SYSTEM_EXPECTED))), re.IGNORECASE)
+
+
+def system_text(system) -> str:
+    """Flatten structured system blocks into a single string for assertions"""
+    return "\n\n".join(block["text"] for block in system)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _patch_anthropic(request):
+    """Patch the Anthropic constructor once for the whole module, recording its calls"""
+    patcher = patch('ai_generator.anthropic.Anthropic', side_effect=_FakeAnthropic)
+    anthropic_cls = patcher.start()
+    request.addfinalizer(patcher.stop)
+    return anthropic_cls
+
+
+@pytest.fixture(scope="session")
+def _search_tools_mod():
+    """search_tools module, imported on first use rather than at collection"""
+    import search_tools
+
+    return search_tools
+
+
+@pytest.fixture(scope="session")
+def _tool_manager_spec(_search_tools_mod):
+    """ToolManager autospec, built once and reset by each test"""
+    return create_autospec(_search_tools_mod.ToolManager, spec_set=True, instance=True)
 
 
 class TestAIGenerator:
     """Test cases for AIGenerator class"""
 
     @pytest.fixture
-    def mock_anthropic_client(self):
-        """Mock Anthropic client"""
-        client = Mock(spec=anthropic.Anthropic)
-        return client
+    def ai_generator(self):
+        """AIGenerator instance with a fake client"""
+        return AIGenerator(
+            api_key="test_key",
+            model="claude-sonnet-4-20250514",
+            base_url="https://api.anthropic.com"
+        )
 
     @pytest.fixture
-    def ai_generator(self, mock_anthropic_client):
-        """AIGenerator instance with mocked client"""
-        with patch('ai_generator.anthropic.Anthropic', return_value=mock_anthropic_client):
-            return AIGenerator(
-                api_key="test_key",
-                model="claude-sonnet-4-20250514",
-                base_url="https://api.anthropic.com"
-            )
+    def mock_anthropic_client(self, ai_generator):
+        """Fake Anthropic client owned by the ai_generator fixture"""
+        return ai_generator.client
 
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def sample_tools(self):
         """Sample tool definitions"""
-        return [
-            {
-                "name": "search_course_content",
-                "description": "Search course materials",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "query": {"type": "string"},
-                        "course_name": {"type": "string"},
-                        "lesson_number": {"type": "integer"}
-                    },
-                    "required": ["query"]
-                }
-            }
-        ]
+        return SAMPLE_TOOLS
 
     @pytest.fixture
-    def mock_tool_manager(self):
+    def mock_tool_manager(self, _tool_manager_spec):
         """Mock tool manager"""
-        manager = Mock()
-        manager.get_tool_definitions.return_value = [
-            {
-                "name": "search_course_content",
-                "description": "Search course materials",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "query": {"type": "string"},
-                        "course_name": {"type": "string"},
-                        "lesson_number": {"type": "integer"}
-                    },
-                    "required": ["query"]
-                }
-            }
-        ]
+        manager = _tool_manager_spec
+        manager.reset_mock(return_value=True, side_effect=True)
+        manager.get_tool_definitions.return_value = SAMPLE_TOOLS
         return manager
 
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def mock_claude_response_no_tools(self):
         """Mock Claude response without tool usage"""
-        response = Mock()
-        response.stop_reason = "end_turn"
-        response.content = [Mock(text="This is a direct response about machine learning.")]
-        return response
+        return _text_resp("This is a direct response about machine learning.")
 
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def mock_claude_response_with_tools(self):
         """Mock Claude response with tool usage"""
-        response = Mock()
-        response.stop_reason = "tool_use"
-
-        # Create tool use block
-        tool_use_block = Mock()
-        tool_use_block.type = "tool_use"
-        tool_use_block.name = "search_course_content"
-        tool_use_block.input = {
+        tool_use_block = _tool_use("search_course_content", {
             "query": "neural networks",
             "course_name": "Machine Learning",
             "lesson_number": 1
-        }
-        tool_use_block.id = "toolu_123"
+        }, "toolu_123")
+        return _resp("tool_use", [tool_use_block])
 
-        response.content = [tool_use_block]
-        return response
-
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def mock_claude_final_response(self):
         """Mock Claude final response after tool execution"""
-        response = Mock()
-        response.stop_reason = "end_turn"
-        response.content = [Mock(text="Based on the search results, neural networks are a key component of machine learning.")]
-        return response
+        return _text_resp("Based on the search results, neural networks are a key component of machine learning.")
 
-    def test_init(self):
+    def test_init(self, _patch_anthropic):
         """Test AIGenerator initialization"""
-        with patch('ai_generator.anthropic.Anthropic') as mock_anthropic:
-            generator = AIGenerator(
-                api_key="test_key",
-                model="claude-sonnet-4",
-                base_url="https://api.anthropic.com"
-            )
-
-        mock_anthropic.assert_called_once_with(
+        _patch_anthropic.reset_mock()
+        generator = AIGenerator(
             api_key="test_key",
+            model="claude-sonnet-4",
             base_url="https://api.anthropic.com"
         )
+
+        _patch_anthropic.assert_called_once()
+        client_kwargs = _patch_anthropic.call_args[1]
+        assert client_kwargs["api_key"] == "test_key"
+        assert client_kwargs["base_url"] == "https://api.anthropic.com"
+        assert isinstance(client_kwargs["http_client"], OrjsonHttpxClient)
         assert generator.model == "claude-sonnet-4"
         assert generator.base_params["temperature"] == 0
         assert generator.base_params["max_tokens"] == 800
 
-    def test_generate_response_direct_answer(self, ai_generator, mock_anthropic_client, mock_claude_response_no_tools):
-        """Test generating response without tool usage"""
+    @pytest.mark.parametrize(
+        "query, history, response, expected_answer, expected_system, expected_system_lower",
+        [
+            pytest.param(
+                "What is machine learning?", None, "no_tools",
+                "This is a direct response about machine learning.", (), {"course materials"},
+                id="direct",
+            ),
+            pytest.param(
+                "What about neural networks?", _HISTORY, "no_tools",
+                "This is a direct response about machine learning.", (_HISTORY, "Previous conversation"), (),
+                id="history",
+            ),
+            pytest.param(
+                "Test query", None, "no_tools", None, (), _SYSTEM_EXPECTED,
+                id="system-prompt",
+            ),
+            pytest.param(
+                "Search query", None, "tool_use", "Let me search for that.", (), (),
+                id="no-tool-manager",
+            ),
+            pytest.param(
+                "Test query", None, Exception("API connection failed"), None, (), (),
+                id="api-error",
+            ),
+        ],
+    )
+    def test_generate_response_variants(self, ai_generator, mock_anthropic_client, mock_claude_response_no_tools, mock_claude_response_with_tools, query, history, response, expected_answer, expected_system, expected_system_lower):
+        """Test single-call responses across history, system prompt, tool and error variants"""
         # Setup
-        mock_anthropic_client.messages.create.return_value = mock_claude_response_no_tools
-
-        # Execute
-        response = ai_generator.generate_response("What is machine learning?")
-
-        # Verify API call
+        kwargs = {"conversation_history": history}
+        if isinstance(response, Exception):
+            mock_anthropic_client.messages.create.side_effect = response
+        elif response == "tool_use":
+            # Claude narrates before requesting the tool, but there is no tool_manager
+            mock_anthropic_client.messages.create.return_value = _resp(
+                "tool_use",
+                [_TextBlock("Let me search for that.")] + mock_claude_response_with_tools.content,
+            )
+            kwargs.update(tools=sample_tools, tool_manager=None)
+        else:
+            mock_anthropic_client.messages.create.return_value = mock_claude_response_no_tools
+
+        # Execute, API errors propagate to the caller
+        if isinstance(response, Exception):
+            with pytest.raises(Exception, match=str(response)):
+                ai_generator.generate_response(query, **kwargs)
+            return
+        answer = ai_generator.generate_response(query, **kwargs)
+
+        # Verify a single API call with the base parameters
         mock_anthropic_client.messages.create.assert_called_once()
         call_args = mock_anthropic_client.messages.create.call_args[1]
 
@@ -134,28 +256,17 @@ class TestAIGenerator:
         assert call_args["temperature"] == 0
         assert call_args["max_tokens"] == 800
         assert call_args["messages"][0]["role"] == "user"
-        assert "What is machine learning?" in call_args["messages"][0]["content"]
-        assert "course materials" in call_args["system"].lower()
-
-        # Verify response
-        assert response == "This is a direct response about machine learning."
+        assert query in call_args["messages"][0]["content"]
 
-    def test_generate_response_with_conversation_history(self, ai_generator, mock_anthropic_client, mock_claude_response_no_tools):
-        """Test generating response with conversation history"""
-        # Setup
-        mock_anthropic_client.messages.create.return_value = mock_claude_response_no_tools
-        history = "User: What is AI?\nAssistant: AI is artificial intelligence..."
-
-        # Execute
-        response = ai_generator.generate_response(
-            "What about neural networks?",
-            conversation_history=history
-        )
+        system_content = system_text(call_args["system"])
+        assert all(s in system_content for s in expected_system)
+        # One regex pass finds every expected phrase regardless of case
+        found = {m.group(0).lower() for m in _SYSTEM_RE.finditer(system_content)}
+        assert set(expected_system_lower) <= found
 
-        # Verify API call includes history
-        call_args = mock_anthropic_client.messages.create.call_args[1]
-        assert history in call_args["system"]
-        assert "Previous conversation" in call_args["system"]
+        # Verify response
+        if expected_answer is not None:
+            assert answer == expected_answer
 
     def test_generate_response_with_tools(self, ai_generator, mock_anthropic_client, mock_claude_response_with_tools, mock_tool_manager, mock_claude_final_response):
         """Test generating response with tool usage"""
@@ -174,8 +285,11 @@ class TestAIGenerator:
             tool_manager=mock_tool_manager
         )
 
+        calls = mock_anthropic_client.messages.create.call_args_list
+        first_call = calls[0].kwargs
+        second_call = calls[1].kwargs
+
         # Verify first API call (tool request)
-        first_call = mock_anthropic_client.messages.create.call_args_list[0][1]
         assert "tools" in first_call
         assert first_call["tool_choice"]["type"] == "auto"
 
@@ -188,16 +302,17 @@ class TestAIGenerator:
         )
 
         # Verify second API call (final response)
-        second_call = mock_anthropic_client.messages.create.call_args_list[1][1]
-        assert len(second_call["messages"]) == 3  # user + assistant(tool_use) + user(tool_result)
+        messages = second_call["messages"]
+        assert len(messages) == 3  # user + assistant(tool_use) + user(tool_result)
 
         # Verify tool result message structure
-        tool_result_message = second_call["messages"][2]
+        tool_result_message = messages[2]
+        tool_results = tool_result_message["content"]
         assert tool_result_message["role"] == "user"
-        assert len(tool_result_message["content"]) == 1
-        assert tool_result_message["content"][0]["type"] == "tool_result"
-        assert tool_result_message["content"][0]["tool_use_id"] == "toolu_123"
-        assert "Found information about neural networks" in tool_result_message["content"][0]["content"]
+        assert len(tool_results) == 1
+        assert tool_results[0]["type"] == "tool_result"
+        assert tool_results[0]["tool_use_id"] == "toolu_123"
+        assert "Found information about neural networks" in tool_results[0]["content"]
 
         # Verify final response
         assert "neural networks" in response.lower()
@@ -220,32 +335,20 @@ class TestAIGenerator:
         )
 
         # Verify tool error is passed to Claude
-        call_args = mock_anthropic_client.messages.create.call_args_list[1][1]
-        tool_result = call_args["messages"][2]["content"][0]["content"]
+        second_call = mock_anthropic_client.messages.create.call_args_list[1].kwargs
+        tool_result = second_call["messages"][2]["content"][0]["content"]
         assert "Error: Failed to connect to vector store" in tool_result
 
     def test_generate_response_multiple_tools(self, ai_generator, mock_anthropic_client, mock_tool_manager):
         """Test handling multiple tool calls in one response"""
         # Setup
-        tool_use_block1 = Mock()
-        tool_use_block1.type = "tool_use"
-        tool_use_block1.name = "search_course_content"
-        tool_use_block1.input = {"query": "python basics"}
-        tool_use_block1.id = "toolu_456"
-
-        tool_use_block2 = Mock()
-        tool_use_block2.type = "tool_use"
-        tool_use_block2.name = "search_course_content"
-        tool_use_block2.input = {"query": "advanced python", "course_name": "Programming"}
-        tool_use_block2.id = "toolu_789"
-
-        tool_request_response = Mock()
-        tool_request_response.stop_reason = "tool_use"
-        tool_request_response.content = [tool_use_block1, tool_use_block2]
-
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        final_response.content = [Mock(text="Here's information about Python basics and advanced topics.")]
+        tool_use_block1 = _tool_use("search_course_content", {"query": "python basics"}, "toolu_456")
+
+        tool_use_block2 = _tool_use("search_course_content", {"query": "advanced python", "course_name": "Programming"}, "toolu_789")
+
+        tool_request_response = _resp("tool_use", [tool_use_block1, tool_use_block2])
+
+        final_response = _text_resp("Here's information about Python basics and advanced topics.")
 
         mock_anthropic_client.messages.create.side_effect = [
             tool_request_response,
@@ -265,46 +368,20 @@ class TestAIGenerator:
         )
 
         # Verify both tools were executed
-        assert mock_tool_manager.execute_tool.call_count == 2
-        mock_tool_manager.execute_tool.assert_any_call("search_course_content", query="python basics")
-        mock_tool_manager.execute_tool.assert_any_call("search_course_content", query="advanced python", course_name="Programming")
+        execute_tool = mock_tool_manager.execute_tool
+        assert execute_tool.call_count == 2
+        # Tools in one response run in parallel, so look calls up by query, not position
+        calls_by_query = {c.kwargs["query"]: c for c in execute_tool.call_args_list}
+        assert calls_by_query["python basics"] == call("search_course_content", query="python basics")
+        assert calls_by_query["advanced python"] == call("search_course_content", query="advanced python", course_name="Programming")
 
         # Verify both tool results were included in second call
-        second_call = mock_anthropic_client.messages.create.call_args_list[1][1]
+        second_call = mock_anthropic_client.messages.create.call_args_list[1].kwargs
         tool_results = second_call["messages"][2]["content"]
         assert len(tool_results) == 2
         assert tool_results[0]["tool_use_id"] == "toolu_456"
         assert tool_results[1]["tool_use_id"] == "toolu_789"
 
-    def test_generate_response_api_error(self, ai_generator, mock_anthropic_client):
-        """Test handling of Claude API errors"""
-        # Setup
-        mock_anthropic_client.messages.create.side_effect = Exception("API connection failed")
-
-        # Execute and verify exception is raised
-        with pytest.raises(Exception, match="API connection failed"):
-            ai_generator.generate_response("Test query")
-
-    def test_system_prompt_structure(self, ai_generator, mock_anthropic_client, mock_claude_response_no_tools):
-        """Test that system prompt is correctly structured"""
-        # Setup
-        mock_anthropic_client.messages.create.return_value = mock_claude_response_no_tools
-
-        # Execute
-        ai_generator.generate_response("Test query")
-
-        # Verify system prompt structure
-        call_args = mock_anthropic_client.messages.create.call_args[1]
-        system_content = call_args["system"]
-
-        # Check for key components
-        assert "course materials" in system_content.lower()
-        assert "search tool" in system_content.lower()
-        assert "anthropic" in system_content.lower()
-        assert "educational" in system_content.lower()
-        assert "brief" in system_content.lower()
-        assert "concise" in system_content.lower()
-
     def test_generate_response_with_history_and_tools(self, ai_generator, mock_anthropic_client, mock_claude_response_with_tools, mock_tool_manager, mock_claude_final_response):
         """Test generating response with both conversation history and tools"""
         # Setup
@@ -315,7 +392,7 @@ class TestAIGenerator:
 
         mock_tool_manager.execute_tool.return_value = "Tool result"
 
-        history = "User: What is AI?\nAssistant: AI is artificial intelligence..."
+        history = _HISTORY
 
         # Execute
         response = ai_generator.generate_response(
@@ -326,70 +403,238 @@ class TestAIGenerator:
         )
 
         # Verify both history and tools are included
-        first_call = mock_anthropic_client.messages.create.call_args_list[0][1]
-        system_content = first_call["system"]
+        first_call = mock_anthropic_client.messages.create.call_args_list[0].kwargs
+        system_content = system_text(first_call["system"])
         assert history in system_content
         assert "tools" in first_call
 
-    def test_generate_response_no_tool_manager(self, ai_generator, mock_anthropic_client, mock_claude_response_with_tools):
-        """Test response when tool_use is returned but no tool_manager is provided"""
+    def test_generate_response_prompt_caching(self, ai_generator, mock_anthropic_client, mock_claude_response_no_tools):
+        """Test that the static system prompt and tools carry cache breakpoints"""
+        # Setup
+        mock_anthropic_client.messages.create.return_value = mock_claude_response_no_tools
+        history = _HISTORY
+
+        # Execute
+        ai_generator.generate_response("Test query", conversation_history=history, tools=sample_tools)
+
+        # Static prompt is cached, volatile history is not
+        call_args = mock_anthropic_client.messages.create.call_args[1]
+        assert call_args["system"][0]["text"] == AIGenerator.SYSTEM_PROMPT
+        assert call_args["system"][0]["cache_control"] == {"type": "ephemeral"}
+        assert "cache_control" not in call_args["system"][1]
+
+        # Last tool is cached without mutating the caller's definitions
+        assert call_args["tools"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert "cache_control" not in sample_tools[-1]
+
+    def test_system_prompt_has_cache_control(self, ai_generator, mock_anthropic_client, mock_claude_response_no_tools):
+        """Test that without history the system prompt is a single cached block"""
         # Setup
-        mock_anthropic_client.messages.create.return_value = mock_claude_response_with_tools
+        mock_anthropic_client.messages.create.return_value = mock_claude_response_no_tools
+
+        # Execute
+        ai_generator.generate_response("Test query")
+
+        # Verify
+        system = mock_anthropic_client.messages.create.call_args.kwargs["system"]
+        assert len(system) == 1
+        assert system[-1]["cache_control"] == {"type": "ephemeral"}
+
+    def test_last_tool_has_cache_control(self, ai_generator, mock_anthropic_client, mock_tool_manager):
+        """Test that tool follow-up rounds keep the breakpoint on the last tool"""
+        # Setup
+        mock_anthropic_client.messages.create.side_effect = iter(_SEQ_2ROUND_RESPONSES)
+        mock_tool_manager.execute_tool.side_effect = ["First result", "Second result"]
+
+        # Execute
+        ai_generator.generate_response("Test query", tools=sample_tools, tool_manager=mock_tool_manager)
+
+        # Verify the round that still offers tools sends the cached definitions
+        followup_tools = mock_anthropic_client.messages.create.call_args_list[1].kwargs["tools"]
+        assert followup_tools[-1]["cache_control"] == {"type": "ephemeral"}
+        assert [tool["name"] for tool in followup_tools] == [tool["name"] for tool in sample_tools]
+
+    def test_multi_turn_marks_last_two_user_messages(self, ai_generator, mock_anthropic_client, mock_tool_manager):
+        """Test that sequential rounds keep cache breakpoints on the last two user turns"""
+        # Setup
+        mock_anthropic_client.messages.create.side_effect = iter(_SEQ_2ROUND_RESPONSES)
+        mock_tool_manager.execute_tool.side_effect = ["First result", "Second result"]
+
+        # Execute
+        ai_generator.generate_response("Test query", tools=sample_tools, tool_manager=mock_tool_manager)
+
+        # Verify the final request: query, first results, second results
+        calls = mock_anthropic_client.messages.create.call_args_list
+        final_call = calls[-1].kwargs
+        user_turns = [msg for msg in final_call["messages"] if msg["role"] == "user"]
+        assert len(user_turns) == 3
+        for turn in user_turns[-2:]:
+            assert turn["content"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert not any("cache_control" in block for block in user_turns[0]["content"])
+
+        # Stays within Anthropic's limit of 4 breakpoints
+        breakpoints = sum("cache_control" in block for block in final_call["system"])
+        breakpoints += sum("cache_control" in tool for tool in final_call["tools"] or [])
+        breakpoints += sum(
+            "cache_control" in block
+            for turn in user_turns
+            for block in turn["content"]
+        )
+        assert breakpoints <= 4
+
+        # The initial request's query message is left as sent
+        assert calls[0].kwargs["messages"][0]["content"] == "Test query"
+
+    def test_generate_response_semantic_cache_hit(self, ai_generator, mock_anthropic_client, mock_tool_manager):
+        """Test that a semantic cache hit skips the API and restores sources"""
+        # Setup
+        ai_generator.response_cache = Mock()
+        ai_generator.response_cache.lookup.return_value = CachedResponse(
+            text="Cached answer", sources=["ML Course - Lesson 1"]
+        )
 
         # Execute
         response = ai_generator.generate_response(
-            "Search query",
+            "What is machine learning?",
             tools=sample_tools,
-            tool_manager=None
+            tool_manager=mock_tool_manager
         )
 
-        # Should return direct response without tool execution
-        mock_anthropic_client.messages.create.assert_called_once()
-        assert response is not None
+        # Verify no API call and sources restored for the UI
+        assert response == "Cached answer"
+        mock_anthropic_client.messages.create.assert_not_called()
+        mock_tool_manager.restore_sources.assert_called_once_with(["ML Course - Lesson 1"])
+
+    def test_generate_response_semantic_cache_miss_and_bypass(self, ai_generator, mock_anthropic_client, mock_claude_response_no_tools):
+        """Test that misses are stored and no_cache bypasses the cache entirely"""
+        # Setup
+        ai_generator.response_cache = Mock()
+        ai_generator.response_cache.lookup.return_value = None
+        mock_anthropic_client.messages.create.return_value = mock_claude_response_no_tools
+
+        # Execute: miss stores the generated answer
+        ai_generator.generate_response("What is machine learning?")
+        ai_generator.response_cache.store.assert_called_once_with(
+            "What is machine learning?",
+            None,
+            "This is a direct response about machine learning.",
+            []
+        )
+
+        # Execute: no_cache neither reads nor writes
+        ai_generator.response_cache.reset_mock()
+        ai_generator.generate_response("What is machine learning?", no_cache=True)
+        ai_generator.response_cache.lookup.assert_not_called()
+        ai_generator.response_cache.store.assert_not_called()
+
+        # Execute: a wrapped prompt is cached under the question it wraps
+        ai_generator.response_cache.reset_mock()
+        ai_generator.generate_response(
+            "Answer this question about course materials: What is machine learning?",
+            cache_key="What is machine learning?"
+        )
+        ai_generator.response_cache.lookup.assert_called_once_with("What is machine learning?", None)
+        assert ai_generator.response_cache.store.call_args.args[0] == "What is machine learning?"
+
+    def test_repeated_identical_call_hits_local_cache(self, mock_claude_response_no_tools):
+        """Test that the opt-in local cache answers identical requests without the API"""
+        # Setup
+        generator = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514", local_cache=True)
+        create = generator.client.messages.create
+        create.return_value = mock_claude_response_no_tools
+
+        # Execute
+        first = generator.generate_response("Q")
+        second = generator.generate_response("Q")
+
+        # Verify one round-trip serves both calls
+        assert first == second == "This is a direct response about machine learning."
+        assert create.call_count == 1
+
+        # Different history or no_cache still reach the API
+        generator.generate_response("Q", conversation_history="User: hi")
+        generator.generate_response("Q", no_cache=True)
+        assert create.call_count == 3
+
+        # Clearing, as after a catalog change, drops the cached answer
+        generator.clear_local_cache()
+        generator.generate_response("Q")
+        assert create.call_count == 4
+
+    def _final_stream(self, mock_anthropic_client, chunks):
+        """Have messages.stream return a context manager yielding chunks"""
+        stream = MagicMock()
+        stream.__enter__.return_value.text_stream = iter(chunks)
+        mock_anthropic_client.messages.stream.return_value = stream
+
+    def test_generate_response_stream_final_answer(self, ai_generator, mock_anthropic_client, mock_claude_response_with_tools, mock_claude_final_response, mock_tool_manager):
+        """Test that only the last round, sent without tools, is streamed"""
+        # Setup: the first follow-up still has tools and answers in one chunk
+        mock_anthropic_client.messages.create.side_effect = [mock_claude_response_with_tools, mock_claude_final_response]
+        mock_tool_manager.execute_tool.return_value = "Neural network content..."
+
+        # Execute
+        chunks = list(ai_generator.generate_response_stream(
+            "Tell me about neural networks",
+            tools=sample_tools,
+            tool_manager=mock_tool_manager
+        ))
+
+        # Verify the answering round was requested, not streamed
+        assert chunks == [mock_claude_final_response.content[0].text]
+        assert mock_anthropic_client.messages.create.call_count == 2
+        followup = mock_anthropic_client.messages.create.call_args[1]
+        assert followup["tools"][0]["name"] == sample_tools[0]["name"]
+        assert followup["messages"][2]["content"][0]["content"] == "Neural network content..."
+        mock_anthropic_client.messages.stream.assert_not_called()
+
+        # Setup: Claude keeps calling tools, so the tool-less last round streams
+        mock_anthropic_client.messages.create.side_effect = iter(_SEQ_MAX_ROUNDS_RESPONSES[:2])
+        self._final_stream(mock_anthropic_client, ["Neural ", "networks ", "explained."])
+
+        chunks = list(ai_generator.generate_response_stream(
+            "Tell me about neural networks",
+            tools=sample_tools,
+            tool_manager=mock_tool_manager
+        ))
+
+        assert chunks == ["Neural ", "networks ", "explained."]
+        assert mock_anthropic_client.messages.stream.call_args[1]["tools"] is None
+
+    def test_generate_response_stream_skips_tool_round_narration(self, mock_tool_manager):
+        """Test that text before a tool call is neither streamed nor cached"""
+        generator = AIGenerator(api_key="test_key", model="test-model", local_cache=True)
+        mock_anthropic_client = generator.client
+
+        # Setup: the second round narrates before its tool call, then the last round answers
+        narrated_round = _resp("tool_use", [
+            _TextBlock("Let me look up the advanced lessons too."),
+            _tool_use("search_course_content", {"query": "advanced"}, "toolu_002"),
+        ])
+        mock_anthropic_client.messages.create.side_effect = [_SEQ_2ROUND_RESPONSES[0], narrated_round]
+        self._final_stream(mock_anthropic_client, ["Final ", "answer."])
+        mock_tool_manager.execute_tool.return_value = "Search results"
+        mock_tool_manager.get_last_sources.return_value = []
+
+        # Execute
+        chunks = list(generator.generate_response_stream(
+            "Tell me about machine learning",
+            tools=sample_tools,
+            tool_manager=mock_tool_manager
+        ))
+
+        # Verify only the final answer is yielded, and a repeat serves just that
+        assert chunks == ["Final ", "answer."]
+        repeat = generator.generate_response("Tell me about machine learning", tools=sample_tools, tool_manager=mock_tool_manager)
+        assert repeat == "Final answer."
+        assert mock_anthropic_client.messages.create.call_count == 2
 
     # Sequential Tool Calling Tests
 
     def test_sequential_tool_execution_two_rounds(self, ai_generator, mock_anthropic_client, mock_tool_manager):
         """Test typical 2-round sequential tool execution"""
-        # Round 1: First tool call
-        first_tool_response = Mock()
-        first_tool_response.stop_reason = "tool_use"
-
-        tool_use_block1 = Mock()
-        tool_use_block1.type = "tool_use"
-        tool_use_block1.name = "search_course_content"
-        tool_use_block1.input = {"query": "machine learning"}
-        tool_use_block1.id = "toolu_001"
-        first_tool_response.content = [tool_use_block1]
-
-        # Round 1: Tool result + continue request
-        intermediate_response = Mock()
-        intermediate_response.stop_reason = "end_turn"
-        intermediate_response.content = [Mock(text="Found some machine learning content. Let me search for more specific information.")]
-
-        # Round 2: Second tool call
-        second_tool_response = Mock()
-        second_tool_response.stop_reason = "tool_use"
-
-        tool_use_block2 = Mock()
-        tool_use_block2.type = "tool_use"
-        tool_use_block2.name = "search_course_content"
-        tool_use_block2.input = {"query": "neural networks", "course_name": "Machine Learning Course"}
-        tool_use_block2.id = "toolu_002"
-        second_tool_response.content = [tool_use_block2]
-
-        # Final response
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        final_response.content = [Mock(text="Comprehensive information about machine learning and neural networks found in the courses.")]
-
-        # Configure mock responses
-        mock_anthropic_client.messages.create.side_effect = [
-            first_tool_response,  # Initial request for tools
-            intermediate_response,  # Response to first tool results
-            second_tool_response,  # Request for second round of tools
-            final_response  # Final answer
-        ]
+        # Configure mock responses: two tool requests, then the final answer
+        mock_anthropic_client.messages.create.side_effect = iter(_SEQ_2ROUND_RESPONSES)
 
         mock_tool_manager.execute_tool.side_effect = [
             "Found basic machine learning content...",
@@ -403,13 +648,19 @@ class TestAIGenerator:
             tool_manager=mock_tool_manager
         )
 
-        # Verify 4 API calls were made (2 tool requests + 2 responses)
-        assert mock_anthropic_client.messages.create.call_count == 4
+        # Verify one API call per round: initial request + 2 follow-ups
+        assert mock_anthropic_client.messages.create.call_count == 3
+
+        # Tools stay available in round 1 and are removed on the last round
+        followup_calls = mock_anthropic_client.messages.create.call_args_list[1:]
+        assert followup_calls[0][1]["tools"]
+        assert followup_calls[1][1]["tools"] is None
 
         # Verify tool execution sequence
-        assert mock_tool_manager.execute_tool.call_count == 2
-        mock_tool_manager.execute_tool.assert_any_call("search_course_content", query="machine learning")
-        mock_tool_manager.execute_tool.assert_any_call("search_course_content", query="neural networks", course_name="Machine Learning Course")
+        tool_calls = mock_tool_manager.execute_tool.call_args_list
+        assert len(tool_calls) == 2
+        assert tool_calls[0] == call("search_course_content", query="machine learning")
+        assert tool_calls[1] == call("search_course_content", query="neural networks", course_name="Machine Learning Course")
 
         # Verify final response
         assert "comprehensive information" in response.lower()
@@ -417,19 +668,10 @@ class TestAIGenerator:
     def test_sequential_tool_execution_early_termination(self, ai_generator, mock_anthropic_client, mock_tool_manager):
         """Test that Claude can stop after 1 round when satisfied"""
         # Setup: One tool call followed by final response (no second tool request)
-        tool_response = Mock()
-        tool_response.stop_reason = "tool_use"
+        tool_use_block = _tool_use("search_course_content", {"query": "python basics"}, "toolu_early")
+        tool_response = _resp("tool_use", [tool_use_block])
 
-        tool_use_block = Mock()
-        tool_use_block.type = "tool_use"
-        tool_use_block.name = "search_course_content"
-        tool_use_block.input = {"query": "python basics"}
-        tool_use_block.id = "toolu_early"
-        tool_response.content = [tool_use_block]
-
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        final_response.content = [Mock(text="I found all the Python basics information you need.")]
+        final_response = _text_resp("I found all the Python basics information you need.")
 
         mock_anthropic_client.messages.create.side_effect = [tool_response, final_response]
         mock_tool_manager.execute_tool.return_value = "Comprehensive Python basics content found..."
@@ -448,39 +690,9 @@ class TestAIGenerator:
 
     def test_sequential_tool_execution_max_rounds_enforcement(self, ai_generator, mock_anthropic_client, mock_tool_manager):
         """Test that system stops at 2 rounds even if Claude wants more"""
-        # Mock Claude wanting to make more than 2 tool calls
-        tool_responses = []
-        tool_use_blocks = []
-
-        for i in range(3):  # 3 tool requests (should be limited to 2)
-            response = Mock()
-            response.stop_reason = "tool_use"
-
-            tool_block = Mock()
-            tool_block.type = "tool_use"
-            tool_block.name = "search_course_content"
-            tool_block.input = {"query": f"query_round_{i+1}"}
-            tool_block.id = f"toolu_{i:03d}"
-            response.content = [tool_block]
-
-            tool_responses.append(response)
-            tool_use_blocks.append(tool_block)
-
-        # Intermediate responses for each round
-        intermediate_responses = [Mock(stop_reason="end_turn", content=[Mock(text=f"Intermediate result {i}")]) for i in range(3)]
-
-        # Final response after hitting max rounds
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        final_response.content = [Mock(text="Final answer after max rounds")]
-
-        # Flatten the response sequence: tool1 + result1 + tool2 + result2 + tool3 + result3 + final
-        mock_sequence = []
-        for i in range(3):
-            mock_sequence.extend([tool_responses[i], intermediate_responses[i]])
-        mock_sequence.append(final_response)
-
-        mock_anthropic_client.messages.create.side_effect = mock_sequence
+        # Mock Claude wanting to make more than 2 tool calls; the final answer
+        # comes back once tools are withheld on the last round
+        mock_anthropic_client.messages.create.side_effect = iter(_SEQ_MAX_ROUNDS_RESPONSES)
         mock_tool_manager.execute_tool.side_effect = [f"Result {i}" for i in range(3)]
 
         # Execute
@@ -490,24 +702,19 @@ class TestAIGenerator:
             tool_manager=mock_tool_manager
         )
 
-        # Should have made at least 5 calls but not all 7 (should stop at max rounds)
-        assert mock_anthropic_client.messages.create.call_count >= 5
+        # Initial request + one follow-up per round, stopping at max rounds
+        assert mock_anthropic_client.messages.create.call_count == 3
+        assert mock_anthropic_client.messages.create.call_args_list[-1][1]["tools"] is None
 
         # Should not execute more than 2 tools
         assert mock_tool_manager.execute_tool.call_count <= 2
+        assert response == "Final answer after max rounds"
 
     def test_sequential_tool_execution_error_handling(self, ai_generator, mock_anthropic_client, mock_tool_manager):
         """Test graceful error handling during sequential execution"""
         # First tool call succeeds
-        first_tool_response = Mock()
-        first_tool_response.stop_reason = "tool_use"
-
-        tool_use_block1 = Mock()
-        tool_use_block1.type = "tool_use"
-        tool_use_block1.name = "search_course_content"
-        tool_use_block1.input = {"query": "database design"}
-        tool_use_block1.id = "toolu_error_1"
-        first_tool_response.content = [tool_use_block1]
+        tool_use_block1 = _tool_use("search_course_content", {"query": "database design"}, "toolu_error_1")
+        first_tool_response = _resp("tool_use", [tool_use_block1])
 
         # Second tool call fails with API error
         mock_anthropic_client.messages.create.side_effect = [
@@ -531,24 +738,13 @@ class TestAIGenerator:
     def test_sequential_tool_execution_conversation_safety(self, ai_generator, mock_anthropic_client, mock_tool_manager):
         """Test conversation length safety check"""
         # Test with very long conversation context
-        long_tool_result = "Result: " + "x" * 10000  # Very long result
-
-        tool_response = Mock()
-        tool_response.stop_reason = "tool_use"
+        tool_use_block = _tool_use("search_course_content", {"query": "test query"}, "toolu_safety")
+        tool_response = _resp("tool_use", [tool_use_block])
 
-        tool_use_block = Mock()
-        tool_use_block.type = "tool_use"
-        tool_use_block.name = "search_course_content"
-        tool_use_block.input = {"query": "test query"}
-        tool_use_block.id = "toolu_safety"
-        tool_response.content = [tool_use_block]
-
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        final_response.content = [Mock(text="Final response after safety check")]
+        final_response = _text_resp("Final response after safety check")
 
         mock_anthropic_client.messages.create.side_effect = [tool_response, final_response]
-        mock_tool_manager.execute_tool.return_value = long_tool_result
+        mock_tool_manager.execute_tool.return_value = _LONG_TOOL_RESULT
 
         # Execute
         response = ai_generator.generate_response(
@@ -561,10 +757,58 @@ class TestAIGenerator:
         assert response is not None
         assert mock_anthropic_client.messages.create.call_count >= 2
 
-    def test_enhanced_tool_manager_sequential_tracking(self):
+    def test_long_tool_results_are_truncated(self, ai_generator, mock_anthropic_client, mock_claude_response_with_tools, mock_claude_response_no_tools, mock_tool_manager):
+        """Test that oversized tool results are capped before being sent back to Claude"""
+        # Setup
+        mock_anthropic_client.messages.create.side_effect = [mock_claude_response_with_tools, mock_claude_response_no_tools]
+        mock_tool_manager.execute_tool.return_value = "x" * 10000
+
+        # Execute
+        ai_generator.generate_response(
+            "Tell me about neural networks",
+            tools=sample_tools,
+            tool_manager=mock_tool_manager
+        )
+
+        # Verify
+        followup_messages = mock_anthropic_client.messages.create.call_args_list[1][1]["messages"]
+        sent = followup_messages[2]["content"][0]["content"]
+        assert len(sent) == ai_generator.MAX_TOOL_RESULT_CHARS
+        assert sent.endswith("...[truncated]")
+
+    def test_compact_messages_elides_oldest_tool_results(self, ai_generator):
+        """Test that long conversations are compacted instead of abandoned"""
+        narration = _TextBlock(text="Let me search first.")
+        tool_block = _tool_use("search_course_content", {}, "toolu_old")
+        messages = [
+            {"role": "user", "content": "Question"},
+            {"role": "assistant", "content": [narration, tool_block]},
+            {"role": "user", "content": [{"type": "tool_result", "tool_use_id": "toolu_old", "content": "a" * 9000}]},
+            {"role": "assistant", "content": [tool_block]},
+            {"role": "user", "content": [{"type": "tool_result", "tool_use_id": "toolu_new", "content": "b" * 9000}]},
+        ]
+
+        total_chars = sum(ai_generator._content_len(msg["content"]) for msg in messages)
+        assert total_chars > 18000
+
+        compacted_chars = ai_generator._compact_messages(messages, total_chars)
+
+        # Running total reflects what was removed, without re-measuring
+        assert compacted_chars == sum(ai_generator._content_len(msg["content"]) for msg in messages)
+        assert compacted_chars < total_chars
+
+        # Oldest result elided with its id kept, newest result untouched
+        old_result = messages[2]["content"][0]
+        assert old_result["tool_use_id"] == "toolu_old"
+        assert old_result["content"] == f"[elided: {'a' * 120}...]"
+        assert messages[4]["content"][0]["content"] == "b" * 9000
+
+        # Narration from the superseded turn is dropped
+        assert messages[1]["content"] == [tool_block]
+
+    def test_enhanced_tool_manager_sequential_tracking(self, _search_tools_mod):
         """Test enhanced ToolManager sequential source tracking"""
-        from search_tools import ToolManager, CourseSearchTool
-        from vector_store import VectorStore
+        ToolManager, CourseSearchTool = _search_tools_mod.ToolManager, _search_tools_mod.CourseSearchTool
 
         # Create mock vector store and tools
         mock_vector_store = Mock()
@@ -603,20 +847,3 @@ class TestAIGenerator:
         assert "Executed 2 tool call(s)" in summary
         assert "databases" in summary
         assert "SQL" in summary
-
-# Sample tools fixture for testing
-sample_tools = [
-    {
-        "name": "search_course_content",
-        "description": "Search course materials",
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "query": {"type": "string"},
-                "course_name": {"type": "string"},
-                "lesson_number": {"type": "integer"}
-            },
-            "required": ["query"]
-        }
-    }
-]
\ No newline at end of file
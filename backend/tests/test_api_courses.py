@@ -5,6 +5,12 @@ import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import Mock, patch
 
+from tests.conftest import response_json
+
+
+# Invariant payloads, built once at import
+MANY_TITLES = tuple(f"Course {i+1}: Advanced Topic {i+1}" for i in range(50))
+
 
 @pytest.mark.api
 class TestCoursesEndpoint:
@@ -15,7 +21,7 @@ class TestCoursesEndpoint:
         response = test_client.get("/api/courses")
 
         assert response.status_code == 200
-        response_data = response.json()
+        response_data = response_json(response)
 
         # Verify response structure
         assert "total_courses" in response_data
@@ -25,18 +31,19 @@ class TestCoursesEndpoint:
         assert response_data["total_courses"] == expected_course_stats["total_courses"]
         assert response_data["course_titles"] == expected_course_stats["course_titles"]
 
-    def test_courses_endpoint_data_types(self, test_client):
+    def test_courses_endpoint_data_types(self, cached_courses_response):
         """Test that response has correct data types."""
-        response = test_client.get("/api/courses")
+        response = cached_courses_response
 
         assert response.status_code == 200
-        response_data = response.json()
+        response_data = response_json(response)
 
         # Verify data types
         assert isinstance(response_data["total_courses"], int)
         assert isinstance(response_data["course_titles"], list)
         assert all(isinstance(title, str) for title in response_data["course_titles"])
 
+    @pytest.mark.xdist_group(name="mock_mutating")
     def test_courses_endpoint_empty_courses(self, test_client):
         """Test courses endpoint when no courses are available."""
         # Mock empty analytics response
@@ -48,10 +55,11 @@ class TestCoursesEndpoint:
         response = test_client.get("/api/courses")
 
         assert response.status_code == 200
-        response_data = response.json()
+        response_data = response_json(response)
         assert response_data["total_courses"] == 0
         assert response_data["course_titles"] == []
 
+    @pytest.mark.xdist_group(name="mock_mutating")
     def test_courses_endpoint_single_course(self, test_client):
         """Test courses endpoint with a single course."""
         # Mock single course response
@@ -63,28 +71,29 @@ class TestCoursesEndpoint:
         response = test_client.get("/api/courses")
 
         assert response.status_code == 200
-        response_data = response.json()
+        response_data = response_json(response)
         assert response_data["total_courses"] == 1
         assert len(response_data["course_titles"]) == 1
         assert response_data["course_titles"][0] == "Introduction to Python"
 
+    @pytest.mark.xdist_group(name="mock_mutating")
     def test_courses_endpoint_many_courses(self, test_client):
         """Test courses endpoint with many courses."""
         # Mock many courses response
-        many_titles = [f"Course {i+1}: Advanced Topic {i+1}" for i in range(50)]
         test_client.app.state.mock_rag_system.get_course_analytics.return_value = {
             "total_courses": 50,
-            "course_titles": many_titles
+            "course_titles": MANY_TITLES
         }
 
         response = test_client.get("/api/courses")
 
         assert response.status_code == 200
-        response_data = response.json()
+        response_data = response_json(response)
         assert response_data["total_courses"] == 50
         assert len(response_data["course_titles"]) == 50
-        assert response_data["course_titles"] == many_titles
+        assert tuple(response_data["course_titles"]) == MANY_TITLES
 
+    @pytest.mark.xdist_group(name="mock_mutating")
     def test_courses_endpoint_server_error(self, test_client):
         """Test courses endpoint handling of server errors."""
         # Mock the analytics method to raise an exception
@@ -93,7 +102,7 @@ class TestCoursesEndpoint:
         response = test_client.get("/api/courses")
 
         assert response.status_code == 500
-        response_data = response.json()
+        response_data = response_json(response)
         assert "detail" in response_data
         assert "Database connection failed" in response_data["detail"]
 
@@ -111,21 +120,22 @@ class TestCoursesEndpoint:
         response = test_client.get("/api/courses?param=value")
         assert response.status_code == 200
 
-    def test_courses_endpoint_response_consistency(self, test_client):
+    def test_courses_endpoint_response_consistency(self, test_client, cached_courses_response):
         """Test that multiple calls return consistent data."""
-        # First call
-        response1 = test_client.get("/api/courses")
+        # First call, made once for the session
+        response1 = cached_courses_response
         assert response1.status_code == 200
-        data1 = response1.json()
+        data1 = response_json(response1)
 
         # Second call
         response2 = test_client.get("/api/courses")
         assert response2.status_code == 200
-        data2 = response2.json()
+        data2 = response_json(response2)
 
         # Should return the same data (since using mocks)
         assert data1 == data2
 
+    @pytest.mark.xdist_group(name="mock_mutating")
     def test_courses_endpoint_with_special_characters(self, test_client):
         """Test courses endpoint with special characters in course titles."""
         special_titles = [
@@ -144,9 +154,10 @@ class TestCoursesEndpoint:
         response = test_client.get("/api/courses")
 
         assert response.status_code == 200
-        response_data = response.json()
+        response_data = response_json(response)
         assert response_data["course_titles"] == special_titles
 
+    @pytest.mark.xdist_group(name="mock_mutating")
     def test_courses_endpoint_unicode_handling(self, test_client):
         """Test courses endpoint with unicode characters in course titles."""
         unicode_titles = [
@@ -164,12 +175,12 @@ class TestCoursesEndpoint:
         response = test_client.get("/api/courses")
 
         assert response.status_code == 200
-        response_data = response.json()
+        response_data = response_json(response)
         assert response_data["course_titles"] == unicode_titles
 
-    def test_courses_endpoint_response_headers(self, test_client):
+    def test_courses_endpoint_response_headers(self, cached_courses_response):
         """Test that response headers are correctly set."""
-        response = test_client.get("/api/courses")
+        response = cached_courses_response
 
         assert response.status_code == 200
         # Check content-type header
@@ -187,7 +198,7 @@ class TestCoursesEndpointIntegration:
         assert response.status_code == 200
 
         # Verify RAG system analytics was called
-        test_client.app.state.mock_rag_system.get_course_analytics.assert_called_once()
+        assert test_client.app.state.mock_rag_system.get_course_analytics.call_count == 1
 
     def test_courses_multiple_calls_analytics_count(self, test_client):
         """Test that multiple calls to courses endpoint call analytics each time."""
@@ -206,13 +217,17 @@ class TestCoursesEndpointIntegration:
         # Should have been called one more time
         assert call_count_after == call_count_before + 1
 
+    @pytest.mark.slow
+    @pytest.mark.xdist_group(name="mock_mutating")
     def test_courses_endpoint_performance_considerations(self, test_client):
         """Test courses endpoint with performance considerations."""
         import time
 
-        # Mock a slower analytics response
+        # Mock a slower analytics response on a simulated clock instead of sleeping
+        simulated_delay = []
+
         def slow_analytics():
-            time.sleep(0.1)  # Simulate some processing time
+            simulated_delay.append(0.1)  # Simulate some processing time
             return {
                 "total_courses": 5,
                 "course_titles": ["Course 1", "Course 2", "Course 3", "Course 4", "Course 5"]
@@ -220,13 +235,13 @@ class TestCoursesEndpointIntegration:
 
         test_client.app.state.mock_rag_system.get_course_analytics.side_effect = slow_analytics
 
-        start_time = time.time()
+        start_time = time.monotonic()
         response = test_client.get("/api/courses")
-        end_time = time.time()
+        end_time = time.monotonic()
 
         assert response.status_code == 200
         # Should complete within reasonable time (allowing for mock delay)
-        assert end_time - start_time < 1.0
+        assert end_time - start_time + sum(simulated_delay) < 1.0
 
-        response_data = response.json()
+        response_data = response_json(response)
         assert response_data["total_courses"] == 5
\ No newline at end of file
@@ -3,7 +3,24 @@ API endpoint tests for the /api/query endpoint.
 """
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, call
+
+from tests.conftest import json_bytes, post_json, response_json
+
+
+# Invariant payloads, built once at import
+LONG_QUERY_BODY = json_bytes({
+    "query": "What is " + "very " * 100 + "long query?",
+    "session_id": None
+})
+
+VARIOUS_QUESTIONS = (
+    "What is machine learning?",
+    "Explain neural networks",
+    "How does backpropagation work?",
+    "What are the differences between CNN and RNN?",
+    "Tell me about reinforcement learning",
+)
 
 
 @pytest.mark.api
@@ -15,7 +32,7 @@ class TestQueryEndpoint:
         response = test_client.post("/api/query", json=query_request_data)
 
         assert response.status_code == 200
-        response_data = response.json()
+        response_data = response_json(response)
 
         # Verify response structure
         assert "answer" in response_data
@@ -37,7 +54,7 @@ class TestQueryEndpoint:
         response = test_client.post("/api/query", json=request_data)
 
         assert response.status_code == 200
-        response_data = response.json()
+        response_data = response_json(response)
         assert response_data["session_id"] == "existing_session_456"
 
     def test_query_endpoint_creates_new_session(self, test_client, query_request_data):
@@ -45,7 +62,7 @@ class TestQueryEndpoint:
         response = test_client.post("/api/query", json=query_request_data)
 
         assert response.status_code == 200
-        response_data = response.json()
+        response_data = response_json(response)
         assert response_data["session_id"] == "test_session_123"
 
     def test_query_endpoint_missing_query_field(self, test_client):
@@ -71,33 +88,28 @@ class TestQueryEndpoint:
 
     def test_query_endpoint_long_query(self, test_client):
         """Test query request with very long query string."""
-        long_query = "What is " + "very " * 100 + "long query?"
-        request_data = {
-            "query": long_query,
-            "session_id": None
-        }
-
-        response = test_client.post("/api/query", json=request_data)
+        response = post_json(test_client, "/api/query", LONG_QUERY_BODY)
 
         assert response.status_code == 200
-        response_data = response.json()
+        response_data = response_json(response)
         assert "answer" in response_data
 
+    @pytest.mark.xdist_group(name="mock_mutating")
     def test_query_endpoint_server_error(self, test_client):
         """Test query endpoint handling of server errors."""
-        # Mock the RAG system to raise an exception
-        with patch.object(test_client.app.state.mock_rag_system, 'query', side_effect=Exception("Database connection failed")):
-            request_data = {
-                "query": "This query will cause an error",
-                "session_id": "test_session"
-            }
+        # Mock the RAG system to raise an exception, test_client resets it afterwards
+        test_client.app.state.mock_rag_system.query.side_effect = Exception("Database connection failed")
+        request_data = {
+            "query": "This query will cause an error",
+            "session_id": "test_session"
+        }
 
-            response = test_client.post("/api/query", json=request_data)
+        response = test_client.post("/api/query", json=request_data)
 
-            assert response.status_code == 500
-            response_data = response.json()
-            assert "detail" in response_data
-            assert "Database connection failed" in response_data["detail"]
+        assert response.status_code == 500
+        response_data = response_json(response)
+        assert "detail" in response_data
+        assert "Database connection failed" in response_data["detail"]
 
     def test_query_endpoint_wrong_http_method(self, test_client):
         """Test that GET method is not allowed for query endpoint."""
@@ -121,7 +133,7 @@ class TestQueryEndpoint:
         response = test_client.post("/api/query", json=query_request_data)
 
         assert response.status_code == 200
-        response_data = response.json()
+        response_data = response_json(response)
 
         sources = response_data["sources"]
         assert isinstance(sources, list)
@@ -142,7 +154,7 @@ class TestQueryEndpoint:
         # First query creates session
         response1 = test_client.post("/api/query", json=first_request)
         assert response1.status_code == 200
-        session_id = response1.json()["session_id"]
+        session_id = response_json(response1)["session_id"]
 
         # Second query uses same session
         second_request = {
@@ -152,30 +164,25 @@ class TestQueryEndpoint:
 
         response2 = test_client.post("/api/query", json=second_request)
         assert response2.status_code == 200
-        assert response2.json()["session_id"] == session_id
-
-    @pytest.mark.parametrize("query_text", [
-        "What is machine learning?",
-        "Explain neural networks",
-        "How does backpropagation work?",
-        "What are the differences between CNN and RNN?",
-        "Tell me about reinforcement learning"
-    ])
-    def test_query_endpoint_various_questions(self, test_client, query_text):
+        assert response_json(response2)["session_id"] == session_id
+
+    def test_query_endpoint_various_questions(self, test_client):
         """Test query endpoint with various types of questions."""
-        request_data = {
-            "query": query_text,
-            "session_id": None
-        }
+        # One test posts every question, so fixture setup is paid once
+        for query_text in VARIOUS_QUESTIONS:
+            request_data = {
+                "query": query_text,
+                "session_id": None
+            }
 
-        response = test_client.post("/api/query", json=request_data)
+            response = test_client.post("/api/query", json=request_data)
 
-        assert response.status_code == 200
-        response_data = response.json()
-        assert "answer" in response_data
-        assert "sources" in response_data
-        assert "session_id" in response_data
-        assert len(response_data["answer"]) > 0
+            assert response.status_code == 200, query_text
+            response_data = response_json(response)
+            assert "answer" in response_data
+            assert "sources" in response_data
+            assert "session_id" in response_data
+            assert len(response_data["answer"]) > 0
 
 
 @pytest.mark.integration
@@ -186,7 +193,7 @@ class TestQueryEndpointIntegration:
     def test_query_with_real_session_manager(self, test_client):
         """Test query endpoint with session manager integration."""
         # Test that session creation is properly called
-        test_client.app.state.mock_rag_system.session_manager.create_session.assert_called()
+        assert test_client.app.state.mock_rag_system.session_manager.create_session.called
 
         request_data = {
             "query": "Test question",
@@ -197,7 +204,7 @@ class TestQueryEndpointIntegration:
         assert response.status_code == 200
 
         # Verify session manager was called
-        test_client.app.state.mock_rag_system.session_manager.create_session.assert_called()
+        assert test_client.app.state.mock_rag_system.session_manager.create_session.called
 
     def test_query_with_real_rag_system(self, test_client):
         """Test query endpoint integration with RAG system."""
@@ -210,7 +217,7 @@ class TestQueryEndpointIntegration:
         assert response.status_code == 200
 
         # Verify RAG system query was called with correct parameters
-        test_client.app.state.mock_rag_system.query.assert_called_with(
+        assert test_client.app.state.mock_rag_system.query.call_args == call(
             request_data["query"],
             request_data["session_id"]
         )
\ No newline at end of file
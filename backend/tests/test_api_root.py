@@ -1,19 +1,36 @@
 """
 API endpoint tests for the root endpoint and general API behavior.
 """
+import asyncio
+
+import httpx
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch
+from unittest.mock import Mock
+
+from tests.conftest import json_bytes, post_json, response_json
+
+
+# Invariant payloads, built once at import
+HUGE_QUERY_BODY = json_bytes({"query": "test " * 10000, "session_id": None})  # Very long query
+BAD_JSON_BYTES = b'{"query": "test", "session_id":}'  # Invalid JSON
+DISALLOWED_METHODS = (
+    ("GET", "/api/query"),
+    ("POST", "/api/courses"),
+    ("PUT", "/api/courses"),
+    ("PATCH", "/api/courses"),
+    ("DELETE", "/api/courses"),
+)
 
 
 @pytest.mark.api
 class TestRootEndpoint:
     """Test cases for the root endpoint and general API behavior."""
 
-    def test_root_endpoint_not_available_in_test_client(self, test_client):
+    def test_root_endpoint_not_available_in_test_client(self, cached_get):
         """Test that root endpoint is not available in test client (no static files mounted)."""
         # The test client doesn't mount static files, so root endpoint should not work
-        response = test_client.get("/")
+        response = cached_get("/")
 
         # Should return 404 since static files are not mounted in test app
         assert response.status_code == 404
@@ -39,18 +56,18 @@ class TestRootEndpoint:
         response = test_client.get("/nonexistent")
         assert response.status_code == 404
 
-    def test_api_response_format_consistency(self, test_client):
+    def test_api_response_format_consistency(self, test_client, cached_courses_response):
         """Test that API responses follow consistent format."""
         # Test courses endpoint format
-        courses_response = test_client.get("/api/courses")
+        courses_response = cached_courses_response
         assert courses_response.status_code == 200
-        courses_data = courses_response.json()
+        courses_data = response_json(courses_response)
         assert isinstance(courses_data, dict)
 
         # Test query endpoint format
         query_response = test_client.post("/api/query", json={"query": "test", "session_id": None})
         assert query_response.status_code == 200
-        query_data = query_response.json()
+        query_data = response_json(query_response)
         assert isinstance(query_data, dict)
 
     def test_cors_headers(self, test_client):
@@ -64,20 +81,21 @@ class TestRootEndpoint:
         response = test_client.get("/api/courses", headers={"Origin": "http://localhost:3000"})
         assert response.status_code == 200
 
+    @pytest.mark.xdist_group(name="mock_mutating")
     def test_api_error_responses(self, test_client):
         """Test that API error responses have consistent format."""
         # Test validation error
         response = test_client.post("/api/query", json={})
         assert response.status_code == 422
-        error_data = response.json()
+        error_data = response_json(response)
         assert "detail" in error_data
 
         # Test server error
-        with patch.object(test_client.app.state.mock_rag_system, 'query', side_effect=Exception("Test error")):
-            response = test_client.post("/api/query", json={"query": "test", "session_id": "test"})
-            assert response.status_code == 500
-            error_data = response.json()
-            assert "detail" in error_data
+        test_client.app.state.mock_rag_system.query.side_effect = Exception("Test error")
+        response = test_client.post("/api/query", json={"query": "test", "session_id": "test"})
+        assert response.status_code == 500
+        error_data = response_json(response)
+        assert "detail" in error_data
 
     def test_content_type_headers(self, test_client):
         """Test that content-type headers are correctly set."""
@@ -95,35 +113,21 @@ class TestRootEndpoint:
 class TestAPIBehavior:
     """Test general API behavior and edge cases."""
 
-    def test_concurrent_requests(self, test_client):
+    @pytest.mark.anyio
+    async def test_concurrent_requests(self, test_client):
         """Test handling of concurrent requests."""
-        import threading
         import time
 
-        results = []
-
-        def make_request():
-            response = test_client.get("/api/courses")
-            results.append(response.status_code)
-
-        # Create multiple threads
-        threads = []
-        for _ in range(5):
-            thread = threading.Thread(target=make_request)
-            threads.append(thread)
-
-        # Start all threads
-        start_time = time.time()
-        for thread in threads:
-            thread.start()
-
-        # Wait for all threads to complete
-        for thread in threads:
-            thread.join()
-
-        end_time = time.time()
+        # Requests run concurrently on one event loop, as they would under uvicorn
+        transport = httpx.ASGITransport(app=test_client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            start_time = time.time()
+            responses = await asyncio.gather(*(client.get("/api/courses") for _ in range(5)))
+            end_time = time.time()
+        results = [response.status_code for response in responses]
 
         # All requests should succeed
+        assert len(results) == 5
         assert all(status == 200 for status in results)
         # Should complete in reasonable time
         assert end_time - start_time < 5.0
@@ -131,8 +135,7 @@ class TestAPIBehavior:
     def test_request_size_limits(self, test_client):
         """Test handling of large requests."""
         # Test very long query
-        long_query = "test " * 10000  # Very long query
-        response = test_client.post("/api/query", json={"query": long_query, "session_id": None})
+        response = post_json(test_client, "/api/query", HUGE_QUERY_BODY)
 
         # Should either succeed or fail gracefully
         assert response.status_code in [200, 413, 422]
@@ -142,7 +145,7 @@ class TestAPIBehavior:
         # Test invalid JSON
         response = test_client.post(
             "/api/query",
-            data='{"query": "test", "session_id":}',  # Invalid JSON
+            content=BAD_JSON_BYTES,
             headers={"Content-Type": "application/json"}
         )
         assert response.status_code == 422
@@ -151,25 +154,27 @@ class TestAPIBehavior:
         response = test_client.post("/api/query", json={"query": 123, "session_id": None})
         assert response.status_code in [200, 422]  # Depending on validation
 
-    def test_http_method_validation(self, test_client):
+    @pytest.mark.anyio
+    async def test_http_method_validation(self, test_client):
         """Test that only allowed HTTP methods work."""
-        # Test GET on POST endpoint
-        response = test_client.get("/api/query")
-        assert response.status_code == 405
-
-        # Test POST on GET endpoint
-        response = test_client.post("/api/courses", json={})
-        assert response.status_code == 405
+        # GET on POST endpoint, POST on GET endpoint, PUT/PATCH/DELETE not allowed
+        transport = httpx.ASGITransport(app=test_client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            responses = await asyncio.gather(
+                *(client.request(method, path) for method, path in DISALLOWED_METHODS)
+            )
 
-        # Test PUT/PATCH/DELETE (should not be allowed)
-        response = test_client.put("/api/courses")
-        assert response.status_code == 405
+        for (method, path), response in zip(DISALLOWED_METHODS, responses):
+            assert response.status_code == 405, f"{method} {path}"
 
-        response = test_client.patch("/api/courses")
-        assert response.status_code == 405
+    def test_lifespan_starts_once_per_session(self, test_client):
+        """Test that the shared client keeps one lifespan across requests."""
+        for _ in range(3):
+            assert test_client.get("/api/courses").status_code == 200
 
-        response = test_client.delete("/api/courses")
-        assert response.status_code == 405
+        # The client is entered once, so startup ran exactly once
+        assert test_client.portal is not None
+        assert test_client.app.state.lifespan_starts == 1
 
     def test_query_parameters_handling(self, test_client):
         """Test handling of query parameters."""
@@ -195,6 +200,7 @@ class TestAPIBehavior:
         response = test_client.post("/api/query", json={"query": "test", "session_id": None}, headers=custom_headers)
         assert response.status_code == 200
 
+    @pytest.mark.slow
     def test_response_time_considerations(self, test_client):
         """Test API response times."""
         import time
@@ -226,7 +232,7 @@ class TestAPIIntegration:
         # Get course statistics first
         courses_response = test_client.get("/api/courses")
         assert courses_response.status_code == 200
-        courses_data = courses_response.json()
+        courses_data = response_json(courses_response)
 
         # Use course information in a query
         if courses_data["course_titles"]:
@@ -242,7 +248,7 @@ class TestAPIIntegration:
         # First query creates session
         response1 = test_client.post("/api/query", json={"query": "First question", "session_id": None})
         assert response1.status_code == 200
-        session_id = response1.json()["session_id"]
+        session_id = response_json(response1)["session_id"]
 
         # Use same session for follow-up questions
         response2 = test_client.post(
@@ -250,7 +256,7 @@ class TestAPIIntegration:
             json={"query": "Follow-up question", "session_id": session_id}
         )
         assert response2.status_code == 200
-        assert response2.json()["session_id"] == session_id
+        assert response_json(response2)["session_id"] == session_id
 
         # Third query with same session
         response3 = test_client.post(
@@ -258,4 +264,4 @@ class TestAPIIntegration:
             json={"query": "Another follow-up", "session_id": session_id}
         )
         assert response3.status_code == 200
-        assert response3.json()["session_id"] == session_id
\ No newline at end of file
+        assert response_json(response3)["session_id"] == session_id
\ No newline at end of file
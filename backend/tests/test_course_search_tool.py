@@ -1,8 +1,9 @@
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from typing import List, Dict, Any
+from types import SimpleNamespace
+from unittest.mock import create_autospec
 
 from search_tools import CourseSearchTool, SearchResults
+from vector_store import VectorStore
 
 
 class TestCourseSearchTool:
@@ -10,9 +11,8 @@ class TestCourseSearchTool:
 
     @pytest.fixture
     def mock_vector_store(self):
-        """Mock vector store for testing"""
-        store = Mock()
-        return store
+        """Vector store mock restricted to the real VectorStore interface"""
+        return create_autospec(VectorStore, instance=True)
 
     @pytest.fixture
     def course_search_tool(self, mock_vector_store):
@@ -20,8 +20,13 @@ class TestCourseSearchTool:
         return CourseSearchTool(mock_vector_store)
 
     @pytest.fixture
+    def formatting_tool(self):
+        """CourseSearchTool for tests that never reach the store"""
+        return CourseSearchTool(SimpleNamespace())
+
+    @pytest.fixture(scope="module")
     def sample_search_results(self):
-        """Sample successful search results"""
+        """Sample successful search results, frozen so tests can share them"""
         return SearchResults(
             documents=[
                 "Machine learning is a subset of artificial intelligence that focuses on neural networks.",
@@ -122,6 +127,15 @@ class TestCourseSearchTool:
         # Verify
         assert result == "No results found"
 
+    def test_empty_results_are_shared_per_message(self):
+        """Test that empty results for the same message reuse one frozen instance"""
+        results = SearchResults.empty("No results found")
+
+        assert SearchResults.empty("No results found") is results
+        assert SearchResults.empty("Search error: timeout") is not results
+        with pytest.raises(AttributeError):
+            results.error = "changed"
+
     def test_execute_no_matching_course_filter(self, course_search_tool, mock_vector_store):
         """Test when no course matches the filter"""
         # Setup
@@ -169,7 +183,7 @@ class TestCourseSearchTool:
         # Verify
         assert "Search error: Vector store crashed" in result
 
-    def test_format_results_with_lesson_links(self, course_search_tool):
+    def test_format_results_with_lesson_links(self, formatting_tool):
         """Test result formatting when lesson links are available"""
         # Setup
         results = SearchResults(
@@ -183,13 +197,13 @@ class TestCourseSearchTool:
         )
 
         # Execute
-        result = course_search_tool._format_results(results)
+        result = formatting_tool._format_results(results)
 
         # Verify
         assert '<a href="https://example.com/ml-lesson1" target="_blank" class="lesson-link">Lesson 1</a>' in result
         assert "Content about neural networks" in result
 
-    def test_format_results_without_lesson_links(self, course_search_tool):
+    def test_format_results_without_lesson_links(self, formatting_tool):
         """Test result formatting when lesson links are not available"""
         # Setup
         results = SearchResults(
@@ -203,14 +217,14 @@ class TestCourseSearchTool:
         )
 
         # Execute
-        result = course_search_tool._format_results(results)
+        result = formatting_tool._format_results(results)
 
         # Verify
         assert "CS Course - Lesson 2" in result
         assert "Content about algorithms" in result
         assert 'target="_blank"' not in result
 
-    def test_format_results_without_lesson_number(self, course_search_tool):
+    def test_format_results_without_lesson_number(self, formatting_tool):
         """Test result formatting when lesson number is not available"""
         # Setup
         results = SearchResults(
@@ -224,7 +238,7 @@ class TestCourseSearchTool:
         )
 
         # Execute
-        result = course_search_tool._format_results(results)
+        result = formatting_tool._format_results(results)
 
         # Verify
         assert "[Intro Course]" in result
@@ -245,10 +259,75 @@ class TestCourseSearchTool:
         assert "Introduction to Machine Learning - Lesson 1" in sources
         assert "Advanced Neural Networks - Lesson 3" in sources
 
-    def test_get_tool_definition(self, course_search_tool):
+    def test_execute_with_sources_leaves_last_sources_untouched(self, course_search_tool, mock_vector_store, sample_search_results):
+        """Test that the concurrency-safe variant returns sources instead of storing them"""
+        # Setup
+        mock_vector_store.search.return_value = sample_search_results
+
+        # Execute
+        result, sources = course_search_tool.execute_with_sources("test query")
+
+        # Verify
+        assert "Introduction to Machine Learning" in result
+        assert sources == ["Introduction to Machine Learning - Lesson 1", "Advanced Neural Networks - Lesson 3"]
+        assert course_search_tool.last_sources == []
+
+    def test_repeated_execute_hits_search_cache(self, course_search_tool, mock_vector_store, sample_search_results):
+        """Test that identical searches reuse the cached result and sources"""
+        # Setup
+        mock_vector_store.search.return_value = sample_search_results
+
+        # Execute
+        first = course_search_tool.execute("neural networks")
+        course_search_tool.last_sources = []
+        second = course_search_tool.execute("neural networks")
+
+        # Verify one store search serves both and sources are restored
+        mock_vector_store.search.assert_called_once()
+        assert second == first
+        assert course_search_tool.last_sources == ["Introduction to Machine Learning - Lesson 1", "Advanced Neural Networks - Lesson 3"]
+
+        # Different filters and cleared caches search again, errors are not cached
+        course_search_tool.execute("neural networks", lesson_number=1)
+        course_search_tool.clear_cache()
+        course_search_tool.execute("neural networks")
+        assert mock_vector_store.search.call_count == 3
+
+        mock_vector_store.search.return_value = SearchResults.empty("Search error: timeout")
+        course_search_tool.execute("flaky")
+        course_search_tool.execute("flaky")
+        assert mock_vector_store.search.call_count == 5
+
+    def test_semantic_cache_serves_near_duplicate_queries(self, mock_vector_store, sample_search_results):
+        """Test that near-duplicate queries with the same filters reuse a cached search"""
+        # Setup: the first two queries embed almost identically
+        embeddings = {
+            "neural networks": [1.0, 0.0, 0.0],
+            "about neural networks": [0.99, 0.1, 0.0],
+            "databases": [0.0, 1.0, 0.0],
+        }
+        mock_vector_store.embed_query.side_effect = embeddings.__getitem__
+        mock_vector_store.search.return_value = sample_search_results
+        tool = CourseSearchTool(mock_vector_store, semantic_threshold=0.95)
+
+        # Execute
+        first = tool.execute("neural networks")
+        second = tool.execute("about neural networks")
+
+        # Verify one store search, handed the embedding so it isn't computed twice
+        assert second == first
+        assert mock_vector_store.search.call_count == 1
+        assert list(mock_vector_store.search.call_args.kwargs["query_embedding"]) == [1.0, 0.0, 0.0]
+
+        # Dissimilar queries and different filters search again
+        tool.execute("databases")
+        tool.execute("about neural networks", lesson_number=1)
+        assert mock_vector_store.search.call_count == 3
+
+    def test_get_tool_definition(self, formatting_tool):
         """Test that tool definition is properly structured"""
         # Execute
-        tool_def = course_search_tool.get_tool_definition()
+        tool_def = formatting_tool.get_tool_definition()
 
         # Verify
         assert tool_def["name"] == "search_course_content"
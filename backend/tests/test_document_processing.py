@@ -1,8 +1,8 @@
 """Test document processing specifically to identify why 0 courses/0 chunks are loaded"""
 
+import io
 import pytest
 import os
-import tempfile
 from unittest.mock import Mock, patch, MagicMock
 
 from document_processor import DocumentProcessor, Course, Lesson, CourseChunk
@@ -27,11 +27,11 @@ This lesson covers neural networks, which are computing systems inspired by biol
 In this final lesson, we explore practical applications of machine learning in real-world scenarios including computer vision and natural language processing."""
 
     @pytest.fixture
-    def sample_course_file(self, sample_course_text):
-        """Create a temporary course file"""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
-            f.write(sample_course_text)
-            return f.name
+    def sample_course_file(self, tmp_path, sample_course_text):
+        """Create a temporary course file, for tests that exercise path handling"""
+        file_path = tmp_path / "course.txt"
+        file_path.write_text(sample_course_text, encoding="utf-8")
+        return str(file_path)
 
     def test_document_processor_initialization(self):
         """Test that DocumentProcessor can be initialized"""
@@ -39,12 +39,12 @@ In this final lesson, we explore practical applications of machine learning in r
         assert processor.chunk_size == 800
         assert processor.chunk_overlap == 100
 
-    def test_process_course_document_with_valid_file(self, sample_course_file):
+    def test_process_course_document_with_valid_file(self, sample_course_text):
         """Test processing a valid course document"""
         processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
 
-        # Process the document
-        course, chunks = processor.process_course_document(sample_course_file)
+        # Process the document in memory, the pipeline is shared with file input
+        course, chunks = processor.process_course_text(sample_course_text)
 
         # Verify course was created
         assert course is not None
@@ -67,54 +67,77 @@ In this final lesson, we explore practical applications of machine learning in r
         with pytest.raises(Exception):
             processor.process_course_document("/nonexistent/file.txt")
 
-    def test_process_course_document_with_empty_file(self):
+    def test_compute_file_hash(self, sample_course_file, sample_course_text):
+        """Test that file hashes are stable SHA-256 digests of the raw bytes"""
+        import hashlib
+
+        processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
+
+        digest = processor.compute_file_hash(sample_course_file)
+
+        assert digest == hashlib.sha256(sample_course_text.encode("utf-8")).hexdigest()
+        assert digest == processor.compute_file_hash(sample_course_file)
+
+    def test_peek_course_title(self, sample_course_file):
+        """Test that the peeked title matches the fully parsed one"""
+        processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
+
+        course, _ = processor.process_course_document(sample_course_file)
+
+        assert processor.peek_course_title(sample_course_file) == course.title
+
+    def test_process_course_document_with_empty_file(self, monkeypatch):
         """Test processing an empty file"""
         processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
 
-        # Create empty file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-            empty_file = f.name
+        # Serve the path from memory so only the path handling is exercised
+        monkeypatch.setattr(
+            "document_processor.open",
+            lambda *args, **kwargs: io.StringIO(""),
+            raising=False,
+        )
 
-        try:
-            # Process empty file
-            course, chunks = processor.process_course_document(empty_file)
+        # Process empty file
+        course, chunks = processor.process_course_document("/courses/empty.txt")
 
-            # Should handle empty file gracefully
-            assert course is not None
-            assert len(chunks) == 0
-        finally:
-            os.unlink(empty_file)
+        # Should handle empty file gracefully, falling back to the file name
+        assert course is not None
+        assert course.title == "empty.txt"
+        assert len(chunks) == 0
 
     def test_chunk_creation_with_large_document(self):
         """Test that chunks are created properly for large documents"""
         # Create a large document that should create multiple chunks
         large_content = "This is a test sentence. " * 100  # Create content that spans multiple chunks
 
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
-            f.write(f"# Test Course\n\n{large_content}")
-            large_file = f.name
-
-        try:
-            processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
-            course, chunks = processor.process_course_document(large_file)
-
-            # Should create multiple chunks for large content
-            assert len(chunks) > 1
-
-            # Verify chunk overlap
-            for i in range(1, len(chunks)):
-                # Chunks should have some overlapping content
-                overlap_found = False
-                for j in range(max(0, i-1), i):
-                    chunks_text = chunks[j].content
-                    next_chunk_text = chunks[i].content
-                    # Check for some overlap
-                    if any(word in next_chunk_text.lower() for word in chunks_text.lower().split()[:10]):
-                        overlap_found = True
-                        break
-                # Note: Overlap verification might be complex, so we're more lenient here
-        finally:
-            os.unlink(large_file)
+        processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
+        course, chunks = processor.process_course_text(f"# Test Course\n\n{large_content}")
+
+        # Should create multiple chunks for large content
+        assert len(chunks) > 1
+
+        # Verify chunk overlap
+        for i in range(1, len(chunks)):
+            # Chunks should have some overlapping content
+            overlap_found = False
+            for j in range(max(0, i-1), i):
+                chunks_text = chunks[j].content
+                next_chunk_text = chunks[i].content
+                # Check for some overlap
+                if any(word in next_chunk_text.lower() for word in chunks_text.lower().split()[:10]):
+                    overlap_found = True
+                    break
+            # Note: Overlap verification might be complex, so we're more lenient here
+
+    def test_chunk_text_respects_size_and_overlap(self):
+        """Test that chunks stay within chunk_size and repeat sentences that fit the overlap"""
+        text = "Alpha beta. Gamma delta. Epsilon zeta. Eta theta."
+
+        with_overlap = DocumentProcessor(chunk_size=30, chunk_overlap=12).chunk_text(text)
+        without_overlap = DocumentProcessor(chunk_size=30, chunk_overlap=0).chunk_text(text)
+
+        assert with_overlap == ["Alpha beta. Gamma delta.", "Gamma delta. Epsilon zeta.", "Eta theta."]
+        assert without_overlap == ["Alpha beta. Gamma delta.", "Epsilon zeta. Eta theta."]
 
     def test_lesson_extraction(self):
         """Test that lessons are properly extracted from course content"""
@@ -129,30 +152,23 @@ This lesson covers ML algorithms.
 ## Lesson 3: Applications
 Real-world applications of ML."""
 
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
-            f.write(course_content)
-            course_file = f.name
+        processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
+        course, chunks = processor.process_course_text(course_content)
 
-        try:
-            processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
-            course, chunks = processor.process_course_document(course_file)
-
-            # Should extract 3 lessons
-            assert len(course.lessons) == 3
-
-            # Verify lesson content
-            lesson_titles = [lesson.title for lesson in course.lessons]
-            assert any("Introduction" in title for title in lesson_titles)
-            assert any("Algorithms" in title for title in lesson_titles)
-            assert any("Applications" in title for title in lesson_titles)
-
-            # Verify lesson numbers
-            lesson_numbers = [lesson.lesson_number for lesson in course.lessons]
-            assert 1 in lesson_numbers
-            assert 2 in lesson_numbers
-            assert 3 in lesson_numbers
-        finally:
-            os.unlink(course_file)
+        # Should extract 3 lessons
+        assert len(course.lessons) == 3
+
+        # Verify lesson content
+        lesson_titles = [lesson.title for lesson in course.lessons]
+        assert any("Introduction" in title for title in lesson_titles)
+        assert any("Algorithms" in title for title in lesson_titles)
+        assert any("Applications" in title for title in lesson_titles)
+
+        # Verify lesson numbers
+        lesson_numbers = [lesson.lesson_number for lesson in course.lessons]
+        assert 1 in lesson_numbers
+        assert 2 in lesson_numbers
+        assert 3 in lesson_numbers
 
     def test_course_title_extraction(self):
         """Test that course title is properly extracted"""
@@ -162,107 +178,107 @@ Instructor: Prof. Johnson
 ## Lesson 1: Python Basics
 Basic Python concepts."""
 
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
-            f.write(course_content)
-            course_file = f.name
-
-        try:
-            processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
-            course, chunks = processor.process_course_document(course_file)
+        processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
+        course, chunks = processor.process_course_text(course_content)
 
-            # Should extract course title
-            assert "Advanced Python Programming" in course.title
-        finally:
-            os.unlink(course_file)
+        # Should extract course title
+        assert "Advanced Python Programming" in course.title
 
     def test_chunk_metadata_assignment(self):
         """Test that chunks have proper metadata"""
         processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
 
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
-            f.write("""# Test Course
+        course, chunks = processor.process_course_text("""# Test Course
 ## Lesson 1: Test Content
 This is test content for chunking.""")
-            course_file = f.name
 
-        try:
-            course, chunks = processor.process_course_document(course_file)
+        # Verify chunk metadata
+        for i, chunk in enumerate(chunks):
+            assert chunk.course_title is not None
+            assert chunk.chunk_index == i
+            assert chunk.lesson_number == 1  # Should be lesson 1
 
-            # Verify chunk metadata
-            for i, chunk in enumerate(chunks):
-                assert chunk.course_title is not None
-                assert chunk.chunk_index == i
-                assert chunk.lesson_number == 1  # Should be lesson 1
-        finally:
-            os.unlink(course_file)
 
+DOCS_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "docs")
 
-class TestRealDocumentProcessing:
-    """Test with the actual course documents to identify processing issues"""
 
-    def test_actual_course_documents_exist(self):
-        """Verify that actual course documents exist and are readable"""
-        docs_path = os.path.join(os.path.dirname(__file__), "..", "..", "docs")
+def _discover_course_files():
+    """List the actual course documents at collection time, one test per file"""
+    if not os.path.exists(DOCS_PATH):
+        return []
+    return sorted(f for f in os.listdir(DOCS_PATH) if f.endswith('.txt'))
 
-        if os.path.exists(docs_path):
-            course_files = [f for f in os.listdir(docs_path) if f.endswith('.txt')]
-            assert len(course_files) > 0, "No course documents found in docs folder"
 
-            # Verify files are readable
-            for course_file in course_files:
-                file_path = os.path.join(docs_path, course_file)
-                assert os.path.getsize(file_path) > 0, f"Course file {course_file} is empty"
+# Scanned once at import; shared by parametrize and the session fixtures
+COURSE_FILES = _discover_course_files()
 
-                # Try to read the file
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    assert len(content.strip()) > 0, f"Course file {course_file} contains no content"
-        else:
-            pytest.skip("No docs folder found - this test requires actual course documents")
 
-    def test_process_actual_course_documents(self):
-        """Test processing the actual course documents"""
-        docs_path = os.path.join(os.path.dirname(__file__), "..", "..", "docs")
+@pytest.fixture(scope="session")
+def docs_path_and_files():
+    """The docs folder and its course files, skipping when there is no docs folder"""
+    if not os.path.exists(DOCS_PATH):
+        pytest.skip("No docs folder found - this test requires actual course documents")
+    return DOCS_PATH, COURSE_FILES
 
-        if not os.path.exists(docs_path):
-            pytest.skip("No docs folder found - this test requires actual course documents")
 
-        processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
-        processed_files = []
+@pytest.fixture(scope="session")
+def processed_docs(docs_path_and_files):
+    """Process every actual course document once, as (filename, course, chunks) tuples"""
+    docs_path, course_files = docs_path_and_files
+    processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
+
+    processed = []
+    for course_file in course_files:
+        file_path = os.path.join(docs_path, course_file)
+        try:
+            course, chunks = processor.process_course_document(file_path)
+        except Exception as e:
+            pytest.fail(f"Error processing {course_file}: {str(e)}")
+        processed.append((course_file, course, chunks))
+    return processed
+
+
+class TestRealDocumentProcessing:
+    """Test with the actual course documents to identify processing issues"""
 
-        course_files = [f for f in os.listdir(docs_path) if f.endswith('.txt')]
+    def test_actual_course_documents_exist(self, docs_path_and_files):
+        """Verify that actual course documents exist and are readable"""
+        docs_path, course_files = docs_path_and_files
+        assert len(course_files) > 0, "No course documents found in docs folder"
 
+        # Verify files are not empty
         for course_file in course_files:
             file_path = os.path.join(docs_path, course_file)
+            assert os.path.getsize(file_path) > 0, f"Course file {course_file} is empty"
 
-            try:
-                course, chunks = processor.process_course_document(file_path)
-                processed_files.append((course_file, course, chunks))
+    @pytest.mark.parametrize("course_file", COURSE_FILES)
+    def test_process_actual_course_documents(self, course_file):
+        """Test processing one actual course document, independent of the others"""
+        processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
+        file_path = os.path.join(DOCS_PATH, course_file)
 
-                # Verify processing succeeded
-                assert course is not None, f"Failed to create course from {course_file}"
-                assert course.title is not None, f"No title extracted from {course_file}"
-                assert len(chunks) > 0, f"No chunks created from {course_file}"
+        try:
+            course, chunks = processor.process_course_document(file_path)
+        except Exception as e:
+            pytest.fail(f"Error processing {course_file}: {str(e)}")
 
-                print(f"Successfully processed {course_file}: {len(chunks)} chunks")
+        # Verify processing succeeded
+        assert course is not None, f"Failed to create course from {course_file}"
+        assert course.title is not None, f"No title extracted from {course_file}"
+        assert len(chunks) > 0, f"No chunks created from {course_file}"
 
-            except Exception as e:
-                pytest.fail(f"Error processing {course_file}: {str(e)}")
+        print(f"Successfully processed {course_file}: {course.title} ({len(chunks)} chunks)")
 
-        # If we get here, all files were processed successfully
-        print(f"Successfully processed {len(processed_files)} course files")
-        for filename, course, chunks in processed_files:
-            print(f"  {filename}: {course.title} ({len(chunks)} chunks)")
-
-    def test_vector_store_can_accept_processed_documents(self):
+    def test_vector_store_can_accept_processed_documents(self, processed_docs):
         """Test that vector store can accept the processed documents"""
-        docs_path = os.path.join(os.path.dirname(__file__), "..", "..", "docs")
+        if not processed_docs:
+            pytest.skip("No course files found")
 
-        if not os.path.exists(docs_path):
-            pytest.skip("No docs folder found - this test requires actual course documents")
+        # Reuse the session's parsed chunks for one course file
+        _, course, chunks = processed_docs[0]
 
         with patch('vector_store.chromadb.PersistentClient') as mock_chroma, \
-             patch('vector_store.SentenceTransformerEmbeddingFunction') as mock_embedding:
+             patch('vector_store.chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction') as mock_embedding:
 
             # Mock ChromaDB components
             mock_client = Mock()
@@ -270,36 +286,21 @@ class TestRealDocumentProcessing:
             mock_collection = Mock()
             mock_client.get_or_create_collection.return_value = mock_collection
 
-            # Test with one course file
-            course_files = [f for f in os.listdir(docs_path) if f.endswith('.txt')]
-            if not course_files:
-                pytest.skip("No course files found")
+            # Try to add to mock vector store through the real batching code
+            try:
+                from vector_store import VectorStore
 
-            file_path = os.path.join(docs_path, course_files[0])
+                store = VectorStore("unused_chroma_path", "all-MiniLM-L6-v2")
+                store.add_course_content(chunks)
 
-            # Process the document
-            processor = DocumentProcessor(chunk_size=800, chunk_overlap=100)
-            course, chunks = processor.process_course_document(file_path)
-
-            # Try to add to mock vector store
-            try:
-                mock_collection.add(
-                    documents=[chunk.content for chunk in chunks],
-                    metadatas=[{
-                        "course_title": chunk.course_title,
-                        "lesson_number": chunk.lesson_number,
-                        "chunk_index": chunk.chunk_index
-                    } for chunk in chunks],
-                    ids=[f"test_{i}" for i in range(len(chunks))]
-                )
-
-                # Verify mock was called with correct data
-                assert mock_collection.add.called
+                # Verify the whole batch went to Chroma in one call
+                mock_collection.add.assert_called_once()
                 call_args = mock_collection.add.call_args
-                assert len(call_args[1]['documents']) == len(chunks)
+                assert call_args[1]['documents'] == [chunk.content for chunk in chunks]
                 assert len(call_args[1]['metadatas']) == len(chunks)
+                assert len(set(call_args[1]['ids'])) == len(chunks)
 
                 print(f"Successfully simulated adding {len(chunks)} chunks to vector store")
 
             except Exception as e:
-                pytest.fail(f"Failed to add processed document to vector store: {str(e)}")
\ No newline at end of file
+                pytest.fail(f"Failed to add processed document to vector store: {str(e)}")
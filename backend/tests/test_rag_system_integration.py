@@ -1,24 +1,61 @@
 """Integration tests for the RAG system to identify why content-related queries return 'query failed'"""
 
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
-import os
-import tempfile
-import json
-from unittest.mock import Mock, patch, MagicMock
+from dataclasses import asdict
+from types import SimpleNamespace
+from unittest.mock import DEFAULT, Mock, patch
 
-# We need to test the actual integration between components
-from rag_system import RAGSystem
+# We need to test the actual integration between components; rag_system
+# itself is imported by the rag_system_cls fixture, so collecting this
+# module doesn't load chromadb, sentence-transformers and anthropic
 from config import Config
 
 
+class _Boom(Exception):
+    """Failure injected through a mock's side_effect, so tests catch exactly it"""
+
+
+# Methods of each patched class's instance that the tests configure
+_PREWARMED_METHODS = {
+    'VectorStore': ('search', 'get_course_analytics', 'add_course_content'),
+    'AIGenerator': ('generate_response', 'get_tool_definitions'),
+    'DocumentProcessor': ('process_course_folder',),
+    'SessionManager': ('get_conversation_history',),
+}
+
+
+def _make_config():
+    """Config's defaults as plain attributes, cheaper than a Mock(spec=Config)"""
+    return SimpleNamespace(**asdict(Config()))
+
+
+@pytest.fixture(scope="session")
+def chroma_dir(tmp_path_factory):
+    """One Chroma directory shared by every config; VectorStore is always patched"""
+    # tmp_path_factory gives each pytest-xdist worker its own base directory
+    return str(tmp_path_factory.mktemp("chroma"))
+
+
+@pytest.fixture(scope="session")
+def rag_system_cls():
+    """The RAGSystem class, imported only once a selected test needs it"""
+    from rag_system import RAGSystem
+
+    return RAGSystem
+
+
 class TestRAGSystemIntegration:
     """Integration tests to identify failure points in the RAG system"""
 
-    @pytest.fixture
-    def mock_config(self):
-        """Create a mock configuration for testing"""
-        config = Mock(spec=Config)
-        config.CHROMA_PATH = tempfile.mkdtemp()  # Create temp directory for tests
+    @pytest.fixture(scope="class")
+    @classmethod
+    def mock_config(cls, chroma_dir):
+        """Create a mock configuration for testing, shared since tests only read it"""
+        config = _make_config()
+        config.CHROMA_PATH = chroma_dir  # Temp directory pytest cleans up
         config.ANTHROPIC_API_KEY = "test_key"
         config.ANTHROPIC_MODEL = "claude-sonnet-4"
         config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
@@ -28,234 +65,307 @@ class TestRAGSystemIntegration:
         config.MAX_HISTORY = 2
         return config
 
+    @pytest.fixture(scope="class")
+    @classmethod
+    def _patched_dependencies(cls):
+        """Patch all the external dependencies once for the class"""
+        # One patcher installs all four; plain Mock, since no test needs
+        # MagicMock's magic methods. Deliberately no autospec or spec: copying
+        # the real signatures costs an introspection pass per class and a
+        # signature check per call, so tests assert inputs via call_args instead
+        with patch.multiple(
+            'rag_system',
+            VectorStore=DEFAULT,
+            AIGenerator=DEFAULT,
+            DocumentProcessor=DEFAULT,
+            SessionManager=DEFAULT,
+            new_callable=Mock,
+        ) as mocks:
+            # Create the instance methods tests configure up front, so later
+            # tests only reset them instead of building new child mocks
+            for name, methods in _PREWARMED_METHODS.items():
+                for method in methods:
+                    getattr(mocks[name].return_value, method)
+            yield mocks
+
+    @pytest.fixture
+    def mock_dependencies(self, _patched_dependencies):
+        """Mock all the external dependencies, reset before each test"""
+        for mock in _patched_dependencies.values():
+            instance = mock.return_value
+            mock.reset_mock(side_effect=True)
+            mock.return_value = instance
+            # Clears return values, side effects and calls but keeps the children
+            instance.reset_mock(return_value=True, side_effect=True)
+
+        # History as a plain string, instead of a child Mock made on first access
+        session_manager = _patched_dependencies['SessionManager'].return_value
+        session_manager.get_conversation_history.return_value = "Previous conversation content"
+
+        return _patched_dependencies
+
     @pytest.fixture
-    def mock_dependencies(self):
-        """Mock all the external dependencies"""
-        with patch('rag_system.VectorStore') as mock_vs, \
-             patch('rag_system.AIGenerator') as mock_ai, \
-             patch('rag_system.DocumentProcessor') as mock_dp, \
-             patch('rag_system.SessionManager') as mock_sm:
-
-            # Configure mocks
-            mock_vs.return_value = Mock()
-            mock_ai.return_value = Mock()
-            mock_dp.return_value = Mock()
-            mock_sm.return_value = Mock()
-
-            yield {
-                'VectorStore': mock_vs,
-                'AIGenerator': mock_ai,
-                'DocumentProcessor': mock_dp,
-                'SessionManager': mock_sm
-            }
-
-    def test_rag_system_initialization(self, mock_config, mock_dependencies):
+    def rag_system(self, rag_system_cls, mock_config, mock_dependencies):
+        """RAGSystem built on the patched dependencies, for tests not about construction"""
+        return rag_system_cls(mock_config)
+
+    def test_rag_system_initialization(self, rag_system_cls, mock_config, mock_dependencies):
         """Test RAG system initialization with mocked dependencies"""
         # This should not raise an exception
-        rag_system = RAGSystem(mock_config)
+        rag_system = rag_system_cls(mock_config)
 
         # Verify components are initialized
         assert rag_system.config == mock_config
-        mock_dependencies['VectorStore'].assert_called_once()
-        mock_dependencies['AIGenerator'].assert_called_once()
-        mock_dependencies['DocumentProcessor'].assert_called_once()
-        mock_dependencies['SessionManager'].assert_called_once()
-
-    def test_vector_store_initialization_failure(self, mock_config, mock_dependencies):
-        """Test what happens when VectorStore fails to initialize"""
-        # Make VectorStore raise an exception
-        mock_dependencies['VectorStore'].side_effect = Exception("ChromaDB connection failed")
-
-        # The system should handle this gracefully
-        with pytest.raises(Exception, match="ChromaDB connection failed"):
-            RAGSystem(mock_config)
+        call_counts = {name: mock.call_count for name, mock in mock_dependencies.items()}
+        assert call_counts == {
+            'VectorStore': 1,
+            'AIGenerator': 1,
+            'DocumentProcessor': 1,
+            'SessionManager': 1,
+        }
 
-    def test_ai_generator_initialization_failure(self, mock_config, mock_dependencies):
-        """Test what happens when AIGenerator fails to initialize"""
-        # Make AIGenerator raise an exception
-        mock_dependencies['AIGenerator'].side_effect = Exception("Invalid API key")
+    @pytest.mark.parametrize(
+        "component, exc_msg",
+        [
+            ("VectorStore", "ChromaDB connection failed"),
+            ("VectorStore", "Invalid ChromaDB path"),
+            ("VectorStore", "Invalid embedding model"),
+            ("AIGenerator", "Invalid API key"),
+        ],
+        ids=["chroma-connection", "invalid-chroma-path", "invalid-embedding-model", "invalid-api-key"],
+    )
+    def test_component_init_failures(self, rag_system_cls, mock_config, mock_dependencies, component, exc_msg):
+        """Test that a component failing to initialize propagates out of RAGSystem"""
+        # Make the component raise an exception
+        mock_dependencies[component].side_effect = _Boom(exc_msg)
+
+        # The system should surface the original error
+        with pytest.raises(_Boom) as exc_info:
+            rag_system_cls(mock_config)
+        assert str(exc_info.value) == exc_msg
 
-        # The system should handle this gracefully
-        with pytest.raises(Exception, match="Invalid API key"):
-            RAGSystem(mock_config)
-
-    def test_query_processing_with_mocked_components(self, mock_config, mock_dependencies):
-        """Test query processing when components are mocked"""
-        rag_system = RAGSystem(mock_config)
-
-        # Mock the query response
-        expected_response = "Test response"
-        mock_dependencies['AIGenerator'].return_value.generate_response.return_value = expected_response
-
-        # Execute a query
-        result = rag_system.query("test query")
-
-        # Verify the query was processed
-        assert result == expected_response
-        mock_dependencies['AIGenerator'].return_value.generate_response.assert_called_once_with(
-            "test query",
-            conversation_history=None,
-            tools=mock_dependencies['AIGenerator'].return_value.get_tool_definitions.return_value,
-            tool_manager=rag_system.tool_manager
+    @pytest.fixture
+    def query_scenario(self, request, mock_dependencies):
+        """Wire the store and AI mocks for one query path, leaving RAGSystem untouched"""
+        session_id, vs_search_return, ai_return, expected = request.param
+        mock_dependencies['VectorStore'].return_value.search.return_value = vs_search_return
+        mock_dependencies['AIGenerator'].return_value.generate_response.return_value = ai_return
+        return session_id, expected
+
+    @pytest.mark.parametrize(
+        "query_scenario",
+        [
+            # (session_id, vs_search_return, ai_return, expected)
+            (None, None, "Test response", "Test response"),
+            ("test_session", None, "Test response with history", "Test response with history"),
+            (None, ([], []), "No relevant content found", "No relevant content found"),
+        ],
+        ids=["mocked-components", "conversation-history", "empty-vector-store"],
+        indirect=True,
+    )
+    def test_query_paths(self, rag_system, mock_dependencies, query_scenario):
+        """Test query processing with and without history, and on an empty vector store"""
+        session_id, expected = query_scenario
+
+        # Execute a query, with history when a session is given
+        result = rag_system.query("test query", session_id=session_id)
+
+        # Verify the query was processed; no search ran, so there are no sources
+        assert result == (expected, [])
+        ai_generator = mock_dependencies['AIGenerator'].return_value
+        assert ai_generator.generate_response.call_count == 1
+        args, kwargs = ai_generator.generate_response.call_args
+        assert args == ()
+        assert kwargs.keys() == {"query", "conversation_history", "tools", "tool_manager", "cache_key"}
+        assert kwargs["query"] == "Answer this question about course materials: test query"
+        # The semantic cache is keyed on the question, not the wrapped prompt
+        assert kwargs["cache_key"] == "test query"
+        assert kwargs["tools"] is rag_system.tool_manager.get_tool_definitions()
+        # Each query runs on its own fork of the shared tool manager
+        assert kwargs["tool_manager"] is not rag_system.tool_manager
+        assert kwargs["tool_manager"].get_tool_definitions() is rag_system.tool_manager.get_tool_definitions()
+
+        # Verify session manager was called only for a session
+        get_history = mock_dependencies['SessionManager'].return_value.get_conversation_history
+        if session_id is None:
+            assert get_history.call_count == 0
+            assert kwargs["conversation_history"] is None
+        else:
+            assert get_history.call_count == 1
+            assert tuple(get_history.call_args) == ((session_id,), {})
+            assert kwargs["conversation_history"] == "Previous conversation content"
+
+    def test_concurrent_queries_keep_their_own_sources(self, rag_system, mock_dependencies):
+        """Test that overlapping queries each return the sources of their own search"""
+        from vector_store import SearchResults
+
+        # Each search's only source is the query that ran it
+        mock_dependencies['VectorStore'].return_value.search.side_effect = (
+            lambda query, **filters: SearchResults(
+                documents=[query], metadata=[{"course_title": query}], distances=[0.1]
+            )
         )
 
-    def test_query_processing_with_conversation_history(self, mock_config, mock_dependencies):
-        """Test query processing with conversation history"""
-        rag_system = RAGSystem(mock_config)
+        # Both queries search before either collects its sources
+        searched = threading.Barrier(2, timeout=5)
 
-        # Mock the query response
-        expected_response = "Test response with history"
-        mock_dependencies['AIGenerator'].return_value.generate_response.return_value = expected_response
+        def answer(query, conversation_history, tools, tool_manager, cache_key):
+            tool_manager.execute_tool("search_course_content", query=query)
+            searched.wait()
+            return f"Answer to {query}"
 
-        # Create mock conversation history
-        history = "Previous conversation content"
+        mock_dependencies['AIGenerator'].return_value.generate_response.side_effect = answer
 
-        # Execute a query with history
-        result = rag_system.query("test query", session_id="test_session")
+        # Execute two queries at once, as the threadpool-backed endpoint does
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(rag_system.query, ["first", "second"]))
 
-        # Verify the query was processed with history
-        assert result == expected_response
+        # Verify neither query got or wiped the other's sources
+        for topic, (response, sources) in zip(["first", "second"], results):
+            prompt = f"Answer this question about course materials: {topic}"
+            assert response == f"Answer to {prompt}"
+            assert sources == [prompt]
 
-        # Verify session manager was called
-        mock_dependencies['SessionManager'].return_value.get_conversation_history.assert_called_once_with("test_session")
-
-    def test_query_processing_failure(self, mock_config, mock_dependencies):
+    def test_query_processing_failure(self, rag_system, mock_dependencies):
         """Test what happens when query processing fails"""
-        rag_system = RAGSystem(mock_config)
-
         # Make the AI generator raise an exception
-        mock_dependencies['AIGenerator'].return_value.generate_response.side_effect = Exception("AI processing failed")
+        mock_dependencies['AIGenerator'].return_value.generate_response.side_effect = _Boom("AI processing failed")
 
         # The system should handle this gracefully
-        with pytest.raises(Exception, match="AI processing failed"):
+        with pytest.raises(_Boom) as exc_info:
             rag_system.query("test query")
+        assert str(exc_info.value) == "AI processing failed"
 
-    def test_course_statistics(self, mock_config, mock_dependencies):
+    def test_course_statistics(self, rag_system, mock_dependencies):
         """Test getting course statistics"""
-        rag_system = RAGSystem(mock_config)
-
         # Mock statistics
-        expected_stats = {
-            "total_courses": 10,
-            "course_titles": ["Course 1", "Course 2"]
-        }
-        mock_dependencies['VectorStore'].return_value.get_course_analytics.return_value = expected_stats
+        mock_dependencies['VectorStore'].return_value.get_analytics.return_value = (
+            ["Course 1", "Course 2"], 10
+        )
 
         # Get statistics
-        stats = rag_system.get_course_statistics()
+        stats = rag_system.get_course_analytics()
 
         # Verify statistics
-        assert stats == expected_stats
-        mock_dependencies['VectorStore'].return_value.get_course_analytics.assert_called_once()
+        assert stats == {
+            "total_courses": 10,
+            "course_titles": ["Course 1", "Course 2"]
+        }
+        assert mock_dependencies['VectorStore'].return_value.get_analytics.call_count == 1
 
-    def test_document_processing_workflow(self, mock_config, mock_dependencies):
+    def test_document_processing_workflow(self, rag_system, mock_dependencies, tmp_path):
         """Test the document processing workflow"""
-        rag_system = RAGSystem(mock_config)
+        from models import Course, CourseChunk
 
         # Mock course data
-        courses = ["Course 1 content", "Course 2 content"]
-        course_chunks = ["Chunk 1", "Chunk 2", "Chunk 3"]
-
-        mock_dependencies['DocumentProcessor'].return_value.process_course_folder.return_value = (courses, course_chunks)
-        mock_dependencies['VectorStore'].return_value.add_course_content.return_value = None
+        course_file = tmp_path / "course.txt"
+        course_file.write_text("Course Title: Course 1")
+        course = Course(title="Course 1")
+        course_chunks = [
+            CourseChunk(content=f"Chunk {i}", course_title="Course 1", chunk_index=i)
+            for i in range(3)
+        ]
+
+        vector_store = mock_dependencies['VectorStore'].return_value
+        vector_store.get_existing_course_titles.return_value = []
+        vector_store.get_existing_course_hashes.return_value = set()
+        processor = mock_dependencies['DocumentProcessor'].return_value
+        processor.compute_file_hash.return_value = "course_hash"
+        processor.process_course_document.return_value = (course, course_chunks)
 
         # Process documents
-        result = rag_system.process_documents("/mock/path")
+        result = rag_system.add_course_folder(str(tmp_path))
 
         # Verify document processing
-        assert result == (courses, course_chunks)
-        mock_dependencies['DocumentProcessor'].return_value.process_course_folder.assert_called_once_with("/mock/path")
-        mock_dependencies['VectorStore'].return_value.add_course_content.assert_called_once_with(courses, course_chunks)
-
-    def test_document_processing_failure(self, mock_config, mock_dependencies):
+        assert result == (1, 3)
+        assert processor.process_course_document.call_count == 1
+        assert tuple(processor.process_course_document.call_args) == ((str(course_file),), {})
+        assert course.content_hash == "course_hash"
+        assert tuple(vector_store.add_course_metadata.call_args) == ((course,), {})
+        assert vector_store.add_course_content.call_count == 1
+        assert tuple(vector_store.add_course_content.call_args) == ((course_chunks,), {})
+
+    @pytest.mark.parametrize(
+        "stored_hashes, replaced",
+        [
+            (set(), True),
+            ({"old_hash"}, True),
+            ({"new_hash"}, False),
+        ],
+        ids=["loaded-before-hashes", "content-changed", "unchanged"],
+    )
+    def test_add_course_folder_existing_title(self, rag_system, mock_dependencies, tmp_path, stored_hashes, replaced):
+        """Test that an existing course is replaced unless its stored hash matches the file"""
+        from models import Course, CourseChunk
+
+        # Setup: the course is already in the store, with or without a matching hash
+        (tmp_path / "course.txt").write_text("Course Title: Course A")
+        course = Course(title="Course A")
+        chunks = [CourseChunk(content="Updated content", course_title="Course A", chunk_index=0)]
+        vector_store = mock_dependencies['VectorStore'].return_value
+        vector_store.get_existing_course_titles.return_value = ["Course A"]
+        vector_store.get_existing_course_hashes.return_value = stored_hashes
+        processor = mock_dependencies['DocumentProcessor'].return_value
+        processor.compute_file_hash.return_value = "new_hash"
+        processor.process_course_document.return_value = (course, chunks)
+
+        # Execute
+        result = rag_system.add_course_folder(str(tmp_path))
+
+        # Verify changed or unhashed courses are replaced, recording the new hash
+        if replaced:
+            assert result == (1, 1)
+            assert vector_store.replace_course.call_count == 1
+            assert tuple(vector_store.replace_course.call_args) == ((course, chunks), {})
+            assert course.content_hash == "new_hash"
+        else:
+            assert result == (0, 0)
+            assert processor.process_course_document.call_count == 0
+            assert vector_store.replace_course.call_count == 0
+        assert vector_store.add_course_metadata.call_count == 0
+
+        # Answers cached for the old catalog are dropped
+        assert mock_dependencies['AIGenerator'].return_value.clear_local_cache.call_count == 1
+
+    def test_document_processing_failure(self, rag_system, mock_dependencies, tmp_path):
         """Test what happens when document processing fails"""
-        rag_system = RAGSystem(mock_config)
-
         # Make document processor raise an exception
-        mock_dependencies['DocumentProcessor'].return_value.process_course_folder.side_effect = Exception("Document processing failed")
-
-        # The system should handle this gracefully
-        with pytest.raises(Exception, match="Document processing failed"):
-            rag_system.process_documents("/mock/path")
-
-
+        (tmp_path / "course.txt").write_text("Course Title: Course 1")
+        vector_store = mock_dependencies['VectorStore'].return_value
+        vector_store.get_existing_course_titles.return_value = []
+        vector_store.get_existing_course_hashes.return_value = set()
+        processor = mock_dependencies['DocumentProcessor'].return_value
+        processor.compute_file_hash.return_value = "course_hash"
+        processor.process_course_document.side_effect = _Boom("Document processing failed")
+
+        # The system should handle this gracefully: the file is skipped, nothing is stored
+        result = rag_system.add_course_folder(str(tmp_path))
+        assert result == (0, 0)
+        assert processor.process_course_document.call_count == 1
+        assert vector_store.add_course_metadata.call_count == 0
+        assert vector_store.add_course_content.call_count == 0
+
+
+@pytest.mark.slow
 class TestRealWorldScenarios:
     """Test scenarios that might cause 'query failed' responses"""
 
-    def test_missing_environment_variables(self):
+    def test_missing_environment_variables(self, rag_system_cls, chroma_dir, monkeypatch):
         """Test what happens when required environment variables are missing"""
-        # Create config without API key
-        config = Mock(spec=Config)
+        # Create config without API key, and nothing in the environment to fall back on
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+        monkeypatch.delenv("ANTHROPIC_AUTH_TOKEN", raising=False)
+        config = _make_config()
         config.ANTHROPIC_API_KEY = None  # Missing API key
-        config.CHROMA_PATH = tempfile.mkdtemp()
-
-        with patch('rag_system.VectorStore') as mock_vs:
-            # This should fail due to missing API key
-            with pytest.raises(Exception):
-                RAGSystem(config)
-
-    def test_invalid_chroma_path(self):
-        """Test what happens when ChromaDB path is invalid"""
-        # Create config with invalid path
-        config = Mock(spec=Config)
-        config.ANTHROPIC_API_KEY = "test_key"
-        config.CHROMA_PATH = "/invalid/path/that/does/not/exist"
-
-        with patch('rag_system.VectorStore') as mock_vs, \
-             patch('rag_system.AIGenerator'):
-
-            # Make VectorStore fail due to invalid path
-            mock_vs.side_effect = Exception("Invalid ChromaDB path")
-
-            # This should fail due to invalid path
-            with pytest.raises(Exception, match="Invalid ChromaDB path"):
-                RAGSystem(config)
-
-    def test_empty_vector_store(self):
-        """Test what happens when vector store is empty"""
-        # Create config
-        config = Mock(spec=Config)
-        config.ANTHROPIC_API_KEY = "test_key"
-        config.CHROMA_PATH = tempfile.mkdtemp()
-
-        with patch('rag_system.VectorStore') as mock_vs, \
-             patch('rag_system.AIGenerator') as mock_ai, \
-             patch('rag_system.DocumentProcessor') as mock_dp, \
-             patch('rag_system.SessionManager') as mock_sm:
-
-            # Create RAG system
-            rag_system = RAGSystem(config)
-
-            # Mock empty vector store
-            mock_vs.return_value.search.return_value = ([], [])  # No results
-
-            # Mock AI response
-            mock_ai.return_value.generate_response.return_value = "No relevant content found"
-
-            # Execute query
-            result = rag_system.query("test query")
-
-            # Should handle empty results gracefully
-            assert result == "No relevant content found"
-
-    def test_embedding_model_failure(self):
-        """Test what happens when embedding model fails"""
-        config = Mock(spec=Config)
-        config.ANTHROPIC_API_KEY = "test_key"
-        config.CHROMA_PATH = tempfile.mkdtemp()
-        config.EMBEDDING_MODEL = "invalid_model"
-
-        with patch('rag_system.VectorStore') as mock_vs, \
-             patch('rag_system.AIGenerator') as mock_ai, \
-             patch('rag_system.DocumentProcessor') as mock_dp, \
-             patch('rag_system.SessionManager') as mock_sm:
+        config.CHROMA_PATH = chroma_dir
+        config.RESPONSE_CACHE_ENABLED = False  # Its lookups would need a real store
 
-            # Make VectorStore fail due to invalid embedding model
-            mock_vs.side_effect = Exception("Invalid embedding model")
+        with patch('rag_system.VectorStore'):
+            # The client is built without complaint; the key is first needed by a query
+            rag_system = rag_system_cls(config)
 
-            # This should fail due to invalid embedding model
-            with pytest.raises(Exception, match="Invalid embedding model"):
-                RAGSystem(config)
+            with pytest.raises(TypeError, match="Could not resolve authentication method"):
+                rag_system.query("test query")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,62 @@
+import hashlib
+
+import chromadb
+import pytest
+from chromadb.api.types import EmbeddingFunction
+
+from response_cache import SemanticResponseCache
+
+
+class _WordCountEmbedding(EmbeddingFunction):
+    """Offline stand-in embedder: hashed word counts, so shared words mean similar vectors"""
+
+    DIMS = 64
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        embeddings = []
+        for text in input:
+            vector = [0.0] * self.DIMS
+            for word in text.lower().replace("?", " ").split():
+                vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.DIMS] += 1
+            embeddings.append(vector)
+        return embeddings
+
+
+class TestSemanticResponseCache:
+    """Test cases for SemanticResponseCache against a local Chroma store"""
+
+    @pytest.fixture
+    def response_cache(self, tmp_path):
+        """Cache on a throwaway store, scoped to one course set"""
+        cache = SemanticResponseCache(
+            chromadb.PersistentClient(path=str(tmp_path)),
+            _WordCountEmbedding(),
+            threshold=0.9,
+        )
+        cache.set_namespace(["Course A"])
+        return cache
+
+    def test_lesson_numbers_do_not_share_answers(self, response_cache):
+        """Test that questions differing only by lesson number miss each other"""
+        # Wrapped in the RAG prompt these two are ~0.92 similar, as bare
+        # questions only ~0.83
+        response_cache.store("What is covered in lesson 2?", None, "Lesson 2 answer", [])
+
+        assert response_cache.lookup("What is covered in lesson 5?") is None
+        assert response_cache.lookup("What is covered in lesson 2?").text == "Lesson 2 answer"
+
+    def test_set_namespace_purges_earlier_course_sets(self, response_cache):
+        """Test that entries for a replaced course set are deleted, not left to pile up"""
+        response_cache.store("What is covered in lesson 2?", None, "Old answer", [])
+
+        # Same course set: nothing is dropped
+        response_cache.set_namespace(["Course A"])
+        assert response_cache.collection.count() == 1
+
+        # Catalog changed: the old entry can never be hit, so it goes
+        response_cache.set_namespace(["Course A", "Course B"])
+        assert response_cache.collection.count() == 0
+        assert response_cache.lookup("What is covered in lesson 2?") is None
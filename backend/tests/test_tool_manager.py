@@ -0,0 +1,58 @@
+from unittest.mock import Mock
+
+from search_tools import CourseSearchTool, ToolManager
+
+
+class TestToolManager:
+    """Test cases for ToolManager execution caching and call history"""
+
+    def test_tool_manager_caches_identical_calls(self):
+        """Test that identical tool calls are served from the exact-match cache"""
+        mock_vector_store = Mock()
+        tool_manager = ToolManager()
+        search_tool = CourseSearchTool(mock_vector_store)
+        tool_manager.register_tool(search_tool)
+
+        mock_results = Mock()
+        mock_results.error = None
+        mock_results.is_empty.return_value = False
+        mock_results.documents = ["Content about databases"]
+        mock_results.metadata = [{"course_title": "Database Course", "lesson_number": 1}]
+        mock_vector_store.search.return_value = mock_results
+
+        # Same params in a different order hit the cache
+        first = tool_manager.execute_tool("search_course_content", query="SQL", lesson_number=1)
+        search_tool.last_sources = []
+        second = tool_manager.execute_tool("search_course_content", lesson_number=1, query="SQL")
+
+        assert first == second
+        assert mock_vector_store.search.call_count == 1
+        assert search_tool.last_sources == ["Database Course - Lesson 1"]
+        assert len(tool_manager.get_call_history()) == 2
+
+        # Resetting sources drops the manager's results, the tool's own search cache persists
+        tool_manager.reset_sources()
+        tool_manager.execute_tool("search_course_content", query="SQL", lesson_number=1)
+        assert mock_vector_store.search.call_count == 1
+        assert len(tool_manager.get_call_history()) == 1
+
+        search_tool.clear_cache()
+        tool_manager.reset_sources()
+        tool_manager.execute_tool("search_course_content", query="SQL", lesson_number=1)
+        assert mock_vector_store.search.call_count == 2
+
+    def test_tool_manager_timestamps_are_opt_in(self):
+        """Test that call history records carry timestamps only when tracking timings"""
+        tool = Mock()
+        tool.get_tool_definition.return_value = {"name": "mock_tool"}
+        tool.execute_with_sources.return_value = ("Result", [])
+
+        tool_manager = ToolManager()
+        tool_manager.register_tool(tool)
+        tool_manager.execute_tool("mock_tool", query="test")
+        assert tool_manager.get_call_history() == [{"tool": "mock_tool", "params": {"query": "test"}}]
+
+        timed_manager = ToolManager(track_timings=True)
+        timed_manager.register_tool(tool)
+        timed_manager.execute_tool("mock_tool", query="test")
+        assert "timestamp" in timed_manager.get_call_history()[0]
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
 
 import chromadb
 from chromadb.config import Settings
@@ -7,34 +9,48 @@ from models import Course, CourseChunk
 from sentence_transformers import SentenceTransformer
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SearchResults:
-    """Container for search results with metadata"""
+    """Immutable container for search results with metadata"""
 
-    documents: List[str]
-    metadata: List[Dict[str, Any]]
-    distances: List[float]
+    documents: Tuple[str, ...]
+    metadata: Tuple[Mapping[str, Any], ...]
+    distances: Tuple[float, ...]
     error: Optional[str] = None
 
+    def __post_init__(self):
+        # Freeze list input so results can be shared and cached safely
+        object.__setattr__(self, "documents", tuple(self.documents))
+        object.__setattr__(
+            self,
+            "metadata",
+            tuple(
+                meta if isinstance(meta, MappingProxyType) else MappingProxyType(meta)
+                for meta in self.metadata
+            ),
+        )
+        object.__setattr__(self, "distances", tuple(self.distances))
+
     @classmethod
     def from_chroma(cls, chroma_results: Dict) -> "SearchResults":
         """Create SearchResults from ChromaDB query results"""
         return cls(
             documents=(
-                chroma_results["documents"][0] if chroma_results["documents"] else []
+                chroma_results["documents"][0] if chroma_results["documents"] else ()
             ),
             metadata=(
-                chroma_results["metadatas"][0] if chroma_results["metadatas"] else []
+                chroma_results["metadatas"][0] if chroma_results["metadatas"] else ()
             ),
             distances=(
-                chroma_results["distances"][0] if chroma_results["distances"] else []
+                chroma_results["distances"][0] if chroma_results["distances"] else ()
             ),
         )
 
     @classmethod
+    @lru_cache(maxsize=64)
     def empty(cls, error_msg: str) -> "SearchResults":
-        """Create empty results with error message"""
-        return cls(documents=[], metadata=[], distances=[], error=error_msg)
+        """Create empty results with error message, shared per message"""
+        return cls(documents=(), metadata=(), distances=(), error=error_msg)
 
     def is_empty(self) -> bool:
         """Check if results are empty"""
@@ -44,6 +60,9 @@ class SearchResults:
 class VectorStore:
     """Vector storage using ChromaDB for course content and metadata"""
 
+    # Chunks encoded per forward pass when embedding content in bulk
+    EMBEDDING_BATCH_SIZE = 128
+
     def __init__(self, chroma_path: str, embedding_model: str, max_results: int = 5):
         self.max_results = max_results
         # Initialize ChromaDB client
@@ -66,6 +85,9 @@ class VectorStore:
             "course_content"
         )  # Actual course material
 
+        # Catalog IDs (course titles), fetched lazily and dropped on writes
+        self._course_titles: Optional[List[str]] = None
+
     def _create_collection(self, name: str):
         """Create or get a ChromaDB collection"""
         return self.client.get_or_create_collection(
@@ -78,6 +100,7 @@ class VectorStore:
         course_name: Optional[str] = None,
         lesson_number: Optional[int] = None,
         limit: Optional[int] = None,
+        query_embedding=None,
     ) -> SearchResults:
         """
         Main search interface that handles course resolution and content search.
@@ -87,6 +110,7 @@ class VectorStore:
             course_name: Optional course name/title to filter by
             lesson_number: Optional lesson number to filter by
             limit: Maximum results to return
+            query_embedding: Precomputed embedding of query, to skip embedding it again
 
         Returns:
             SearchResults object with documents and metadata
@@ -106,15 +130,32 @@ class VectorStore:
         search_limit = limit if limit is not None else self.max_results
 
         try:
-            results = self.course_content.query(
-                query_texts=[query], n_results=search_limit, where=filter_dict
-            )
+            if query_embedding is not None:
+                results = self.course_content.query(
+                    query_embeddings=[query_embedding],
+                    n_results=search_limit,
+                    where=filter_dict,
+                )
+            else:
+                results = self.course_content.query(
+                    query_texts=[query], n_results=search_limit, where=filter_dict
+                )
             return SearchResults.from_chroma(results)
         except Exception as e:
             return SearchResults.empty(f"Search error: {str(e)}")
 
     def _resolve_course_name(self, course_name: str) -> Optional[str]:
-        """Use vector search to find best matching course by name"""
+        """Find the best matching course, by exact title before vector search"""
+        titles = self.get_existing_course_titles()
+        if not titles:
+            # Nothing in the catalog can match, so skip the embedding round-trip
+            return None
+
+        normalized = course_name.strip().casefold()
+        for title in titles:
+            if title.casefold() == normalized:
+                return title
+
         try:
             results = self.course_catalog.query(query_texts=[course_name], n_results=1)
 
@@ -149,9 +190,96 @@ class VectorStore:
 
     def add_course_metadata(self, course: Course):
         """Add course information to the catalog for semantic search"""
-        import json
+        self.add_courses_metadata([course])
+
+    def add_courses_metadata(self, courses: List[Course]):
+        """Add several courses to the catalog in a single call"""
+        if not courses:
+            return
+
+        self._course_titles = None
+        self.course_catalog.add(
+            documents=[course.title for course in courses],
+            metadatas=[self._catalog_metadata(course) for course in courses],
+            ids=[course.title for course in courses],
+        )
+
+    def add_course_content(self, chunks: List[CourseChunk]):
+        """Add course content chunks to the vector store"""
+        if not chunks:
+            return
+
+        documents, metadatas, ids = self._content_entries(chunks)
+        self.course_content.add(documents=documents, metadatas=metadatas, ids=ids)
+
+    def add_course(self, course: Course, chunks: List[CourseChunk]):
+        """Write a course and its content chunks to the vector store"""
+        self.add_courses([course], chunks)
+
+    def add_courses(self, courses: List[Course], chunks: List[CourseChunk]):
+        """
+        Write several courses and their chunks with one upsert per collection.
+
+        Args:
+            courses: Courses to add to the catalog
+            chunks: Content chunks belonging to those courses
+        """
+        if courses:
+            self._course_titles = None
+            self.course_catalog.upsert(
+                documents=[course.title for course in courses],
+                metadatas=[self._catalog_metadata(course) for course in courses],
+                ids=[course.title for course in courses],
+            )
+
+        if chunks:
+            documents, metadatas, ids = self._content_entries(chunks)
+            self.course_content.upsert(
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids,
+                embeddings=self._embed_documents(documents),
+            )
+
+    def replace_course(self, course: Course, chunks: List[CourseChunk]):
+        """
+        Overwrite a course already in the store with a new version of it.
+
+        The course's old chunks are deleted first, so chunks the new version
+        no longer has don't linger in search results.
+
+        Args:
+            course: New version of the course, keyed by its title
+            chunks: Content chunks of the new version
+        """
+        self.course_content.delete(where={"course_title": course.title})
+        self.add_courses([course], chunks)
+
+    def embed_query(self, query: str):
+        """Embed a search query the same way course content is embedded"""
+        return self._embed_documents([query])[0]
+
+    def _embed_documents(self, documents: List[str]):
+        """Embed documents in large batches rather than Chroma's default batch size"""
+        model = getattr(self.embedding_function, "_model", None)
+        if model is None:
+            return self.embedding_function(documents)
+
+        # Match the embedding function's settings so stored and query
+        # embeddings stay comparable
+        return model.encode(
+            documents,
+            batch_size=self.EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=getattr(
+                self.embedding_function, "normalize_embeddings", False
+            ),
+            show_progress_bar=False,
+        )
 
-        course_text = course.title
+    def _catalog_metadata(self, course: Course) -> Dict[str, Any]:
+        """Build the catalog metadata for a course"""
+        import json
 
         # Build lessons metadata and serialize as JSON string
         lessons_metadata = []
@@ -164,27 +292,24 @@ class VectorStore:
                 }
             )
 
-        self.course_catalog.add(
-            documents=[course_text],
-            metadatas=[
-                {
-                    "title": course.title,
-                    "instructor": course.instructor,
-                    "course_link": course.course_link,
-                    "lessons_json": json.dumps(
-                        lessons_metadata
-                    ),  # Serialize as JSON string
-                    "lesson_count": len(course.lessons),
-                }
-            ],
-            ids=[course.title],
-        )
-
-    def add_course_content(self, chunks: List[CourseChunk]):
-        """Add course content chunks to the vector store"""
-        if not chunks:
-            return
+        metadata = {
+            "title": course.title,
+            "instructor": course.instructor,
+            "course_link": course.course_link,
+            "lessons_json": json.dumps(lessons_metadata),  # Serialize as JSON string
+            "lesson_count": len(course.lessons),
+        }
+        if course.content_hash:
+            metadata["content_hash"] = course.content_hash
+        return metadata
+
+    def _content_entries(self, chunks: List[CourseChunk]):
+        """
+        Build the documents, metadatas and IDs for content chunks.
 
+        The three lists are parallel, so a whole batch goes to Chroma as one
+        add/upsert call.
+        """
         documents = [chunk.content for chunk in chunks]
         metadatas = [{
             "course_title": chunk.course_title,
@@ -197,8 +322,7 @@ class VectorStore:
             f"{chunk.course_title.replace(' ', '_')}_{chunk.chunk_index}"
             for chunk in chunks
         ]
-
-        self.course_content.add(documents=documents, metadatas=metadatas, ids=ids)
+        return documents, metadatas, ids
 
     def clear_all_data(self):
         """Clear all data from both collections"""
@@ -210,19 +334,50 @@ class VectorStore:
             self.course_content = self._create_collection("course_content")
         except Exception as e:
             print(f"Error clearing data: {e}")
+        finally:
+            self._course_titles = None
 
     def get_existing_course_titles(self) -> List[str]:
         """Get all existing course titles from the vector store"""
+        if self._course_titles is not None:
+            return list(self._course_titles)
+
         try:
-            # Get all documents from the catalog
-            results = self.course_catalog.get()
+            # Only the IDs are needed, skip loading documents and metadata
+            results = self.course_catalog.get(include=[])
             if results and "ids" in results:
-                return results["ids"]
+                self._course_titles = results["ids"]
+                return list(self._course_titles)
             return []
         except Exception as e:
             print(f"Error getting existing course titles: {e}")
             return []
 
+    def get_existing_course_hashes(self) -> Set[str]:
+        """Get the source file hashes of courses already in the vector store"""
+        try:
+            results = self.course_catalog.get(include=["metadatas"])
+            if results and results.get("metadatas"):
+                return {
+                    metadata["content_hash"]
+                    for metadata in results["metadatas"]
+                    if metadata and metadata.get("content_hash")
+                }
+            return set()
+        except Exception as e:
+            print(f"Error getting existing course hashes: {e}")
+            return set()
+
+    def get_analytics(self) -> Tuple[List[str], int]:
+        """
+        Get the course titles and course count from a single catalog read.
+
+        Returns:
+            Tuple of (course titles, number of courses)
+        """
+        titles = self.get_existing_course_titles()
+        return titles, len(titles)
+
     def get_course_count(self) -> int:
         """Get the total number of courses in the vector store"""
         try: